@@ -0,0 +1,236 @@
+"""Home Assistant WebSocket API client on uasyncio streams."""
+
+from binascii import b2a_base64
+from json import dumps, loads
+from os import urandom
+from struct import pack, unpack
+import uasyncio
+from include.http_client import HTTPTimeout, parse_url, resolve
+from include.json_stream import Extractor
+
+# WebSocket frame opcodes
+TEXT = const(0x1)
+CLOSE = const(0x8)
+PING = const(0x9)
+PONG = const(0xA)
+# Messages up to this size are parsed whole, larger ones are state change
+# events and only the new state's info attribute is kept from them
+SMALL_MESSAGE = const(512)
+EVENT_INFO = ("event", "variables", "trigger", "to_state", "attributes", "info")
+
+
+class HAWebSocket(object):
+    """Connection to the Home Assistant WebSocket API.
+
+    Attributes:
+        messages: Number of messages received
+        events: Number of state changes passed on
+        pings: Number of pings sent to check an idle connection
+    """
+
+    def __init__(self, base_url, token, ping_ms=300000, timeout_ms=10000, addr=None):
+        """Constructor for the WebSocket connection.
+
+        Args:
+            base_url (string): Home Assistant URL, eg. http://192.168.1.10:8123
+            token (string): Long-lived access token.
+            ping_ms (int): Idle time before checking the connection with a
+                ping.  Default is 300000 (5 minutes).
+            timeout_ms (int): Time allowed to connect, and for each reply
+                and message once it has started.  Default is 10000.
+            addr (string): The host's IP address, from resolve() before the
+                event loop started.  Without it a host name is looked up
+                here, which blocks.
+        """
+        self.scheme, self.host, self.port, path = parse_url(base_url)
+        self.path = path.rstrip("/") + "/api/websocket"
+        self.addr = addr or resolve(self.host, self.port)
+        self.token = token
+        self.ping_ms = ping_ms
+        self.timeout_ms = timeout_ms
+        self.reader = None
+        self.writer = None
+        self.last_id = 0
+        self.messages = 0
+        self.events = 0
+        self.pings = 0
+
+    async def timed(self, awaitable, what):
+        """Await within timeout_ms."""
+        try:
+            return await uasyncio.wait_for_ms(awaitable, self.timeout_ms)
+        except uasyncio.TimeoutError:
+            raise HTTPTimeout(f"{what} timed out after {self.timeout_ms} ms")
+
+    async def connect(self):
+        """Open the WebSocket and authenticate."""
+        if self.scheme == "https":
+            connect = uasyncio.open_connection(
+                self.addr, self.port, ssl=True, server_hostname=self.host
+            )
+        else:
+            connect = uasyncio.open_connection(self.addr, self.port)
+        self.reader, self.writer = await self.timed(connect, "connect")
+        key = b2a_base64(urandom(16)).strip().decode()
+        self.writer.write(
+            (
+                f"GET {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        await self.timed(self.writer.drain(), "handshake")
+        status = await self.timed(self.reader.readline(), "handshake")
+        if status.split(b" ")[1:2] != [b"101"]:
+            raise OSError("WebSocket refused: " + status.decode().strip())
+        while True:
+            line = await self.timed(self.reader.readline(), "handshake")
+            if line in (b"\r\n", b"\n", b""):
+                break
+        msg = await self.receive()
+        if msg.get("type") == "auth_required":
+            await self.send({"type": "auth", "access_token": self.token})
+            msg = await self.receive()
+        if msg.get("type") != "auth_ok":
+            raise OSError("Authentication failed: " + str(msg.get("message")))
+
+    async def close(self):
+        """Close the WebSocket, if it is open."""
+        writer = self.writer
+        if writer is not None:
+            self.reader = self.writer = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def send_frame(self, opcode, payload):
+        """Send one masked frame, as clients must."""
+        n = len(payload)
+        if n < 126:
+            head = pack(">BB", 0x80 | opcode, 0x80 | n)
+        else:
+            head = pack(">BBH", 0x80 | opcode, 0x80 | 126, n)
+        mask = urandom(4)
+        masked = bytearray(payload)
+        for i in range(n):
+            masked[i] ^= mask[i & 3]
+        self.writer.write(head + mask)
+        self.writer.write(masked)
+        await self.timed(self.writer.drain(), "send")
+
+    async def send(self, msg):
+        """Send a message, numbering it if it needs an id.
+
+        Returns:
+            int: The message id (0 for auth).
+        """
+        if msg.get("type") != "auth":
+            self.last_id += 1
+            msg["id"] = self.last_id
+        await self.send_frame(TEXT, dumps(msg).encode())
+        return msg.get("id", 0)
+
+    async def read_payload(self, length, extractor):
+        """Read a frame's payload, whole or through an extractor."""
+        if extractor is None:
+            return await self.reader.readexactly(length)
+        while length:
+            data = await self.reader.read(min(length, 256))
+            if not data:
+                raise OSError("WebSocket closed part way through a message")
+            length -= len(data)
+            if not extractor.done:
+                extractor.feed(data)
+        return None
+
+    async def receive(self, wait_ms=None):
+        """Return the next message.
+
+        Args:
+            wait_ms (int): Time to wait for it to start (default
+                timeout_ms).
+        Returns:
+            dict: The message.  A state change event larger than
+            SMALL_MESSAGE is returned as {"type": "event", "info": ...}
+            with only the new state's info attribute.
+        Raises:
+            uasyncio.TimeoutError: No message started within wait_ms.
+        """
+        while True:
+            head = await uasyncio.wait_for_ms(
+                self.reader.readexactly(2), wait_ms or self.timeout_ms
+            )
+            if not head[0] & 0x80:
+                raise OSError("Fragmented WebSocket messages are not supported")
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = unpack(">H", await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = unpack(">Q", await self.reader.readexactly(8))[0]
+            if opcode == TEXT and length > SMALL_MESSAGE:
+                extractor = Extractor(EVENT_INFO)
+                await self.timed(self.read_payload(length, extractor), "message")
+                self.messages += 1
+                if extractor.found:
+                    return {"type": "event", "info": extractor.value}
+                continue  # nothing the display uses
+            payload = await self.timed(self.read_payload(length, None), "message")
+            if opcode == TEXT:
+                self.messages += 1
+                return loads(payload)
+            if opcode == PING:
+                await self.send_frame(PONG, payload)
+            elif opcode == CLOSE:
+                raise OSError("WebSocket closed by Home Assistant")
+
+    async def listen(self, entity_id, on_update):
+        """Subscribe to changes of an entity's state and pass them on.
+
+        Args:
+            entity_id (string): Entity to watch, eg. input_text.solar_display_data
+            on_update (function): Called with the new state's info attribute
+                on every change.
+        Note:
+            Only returns by raising, when the connection drops or stops
+            answering pings.
+        """
+        msg_id = await self.send(
+            {
+                "type": "subscribe_trigger",
+                "trigger": {"platform": "state", "entity_id": entity_id},
+            }
+        )
+        msg = await self.receive()
+        if msg.get("id") != msg_id or not msg.get("success"):
+            raise OSError("Subscription failed: " + str(msg.get("error")))
+        pinged = False
+        while True:
+            try:
+                msg = await self.receive(self.ping_ms)
+            except uasyncio.TimeoutError:
+                if pinged:
+                    raise HTTPTimeout("Home Assistant stopped answering pings")
+                await self.send({"type": "ping"})
+                self.pings += 1
+                pinged = True
+                continue
+            pinged = False
+            if msg.get("type") != "event":
+                continue
+            info = msg
+            for key in ("info",) if "info" in msg else EVENT_INFO:
+                info = info.get(key) if isinstance(info, dict) else None
+            if info is not None:
+                self.events += 1
+                on_update(info)
+
+    def stats(self):
+        """Return connection statistics.
+
+        Returns:
+            dict: messages, events and pings.
+        """
+        return {"messages": self.messages, "events": self.events, "pings": self.pings}
@@ -0,0 +1,476 @@
+"""Non-blocking HTTP/1.1 client on uasyncio streams."""
+
+from json import dumps, loads
+import socket
+import uasyncio
+from utime import ticks_diff, ticks_ms
+from include.json_stream import extract as extract_json
+
+# Milliseconds allowed for each phase of a request
+TIMEOUTS = {
+    "connect": 5000,  # TCP (and TLS) connection
+    "send": 5000,  # request line, headers and body
+    "headers": 10000,  # status line and headers of the response
+    "body": 10000,  # the rest of the response
+}
+
+
+class HTTPTimeout(Exception):
+    """A phase of a request took longer than its timeout."""
+
+
+class Response(object):
+    """HTTP response with the urequests attributes.
+
+    Attributes:
+        status_code: HTTP status
+        reason: Reason phrase of the status line
+        headers: Response headers, with lower case names
+        content: Body bytes (empty when a value was extracted)
+        value: Value picked out of a JSON body with extract
+    """
+
+    def __init__(self, status_code, reason, headers, content, value=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.value = value
+        self.encoding = "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def close(self):
+        """Drop the body (the connection is already closed)."""
+        self.content = b""
+
+    def json(self):
+        return loads(self.content)
+
+
+class Body(object):
+    """Response body as a stream, by its length, in chunks or to the end.
+
+    Attributes:
+        reader: Stream of the connection
+        left: Bytes left in the body, or in the current chunk of a chunked
+            body (-1 = until the connection closes)
+        chunked: The body is chunked and has more chunks to come
+    """
+
+    def __init__(self, reader, headers):
+        self.reader = reader
+        self.chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+        self.first = True
+        self.left = 0 if self.chunked else int(headers.get("content-length", -1))
+
+    async def read(self, n):
+        """Return up to n bytes of the body, or b"" at its end."""
+        if not self.left:
+            if not self.chunked:
+                return b""
+            if not self.first:
+                await self.reader.readline()  # line end after the last chunk
+            self.first = False
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if not size:
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                self.chunked = False
+                return b""
+            self.left = size
+        data = await self.reader.read(n if self.left < 0 else min(n, self.left))
+        if self.left > 0:
+            if not data:
+                raise OSError("Connection closed part way through the body")
+            self.left -= len(data)
+        return data
+
+
+def parse_url(url):
+    """Split a URL into its parts.
+
+    Args:
+        url (string): http:// or https:// URL.
+    Returns:
+        (string, string, int, string): Scheme, host, port and path.
+    """
+    scheme, _, rest = url.partition("://")
+    if scheme not in ("http", "https"):
+        raise ValueError("Unsupported URL: " + url)
+    host, slash, path = rest.partition("/")
+    port = 443 if scheme == "https" else 80
+    if ":" in host:
+        host, port = host.rsplit(":", 1)
+        port = int(port)
+    return scheme, host, port, slash + path or "/"
+
+
+def resolve(host, port):
+    """Return the IP address of a host.
+
+    Note:
+        getaddrinfo() blocks in MicroPython, stalling every task while it
+        waits, so call this before the event loop starts and pass the
+        address to the clients.  IP addresses are passed straight through
+        without a lookup, so a URL with one avoids it entirely.
+    """
+    if host.replace(".", "").isdigit():
+        return host
+    return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][-1][0]
+
+
+async def _phase(name, awaitable, timeouts):
+    """Await one phase of a request within its timeout."""
+    try:
+        return await uasyncio.wait_for_ms(awaitable, timeouts[name])
+    except uasyncio.TimeoutError:
+        raise HTTPTimeout(f"{name} timed out after {timeouts[name]} ms")
+
+
+async def _read_head(reader):
+    """Read the status line and headers of a response."""
+    line = await reader.readline()
+    if not line:
+        raise OSError("Connection closed before the response")
+    status = line.decode().rstrip().split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(status[1]), status[2] if len(status) > 2 else "", headers
+
+
+async def _read_body(reader, headers):
+    """Read a whole response body."""
+    body = Body(reader, headers)
+    if body.left > 0:
+        return await reader.readexactly(body.left)
+    parts = []
+    while True:
+        data = await body.read(1024)
+        if not data:
+            return b"".join(parts)
+        parts.append(data)
+
+
+def _timeouts(timeouts, defaults=TIMEOUTS):
+    """Return the default timeouts with any given ones in their place."""
+    return defaults if timeouts is None else dict(defaults, **timeouts)
+
+
+def _netloc(scheme, host, port):
+    """Return the Host header for a host and port."""
+    return host if port == (443 if scheme == "https" else 80) else f"{host}:{port}"
+
+
+def _encode(method, path, netloc, headers, data, json, connection):
+    """Return the request head and body as bytes."""
+    if json is not None:
+        data = dumps(json)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    head = f"{method} {path} HTTP/1.1\r\nHost: {netloc}\r\nConnection: {connection}\r\n"
+    for name, value in (headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    if data:
+        head += f"Content-Length: {len(data)}\r\n"
+    if json is not None:
+        head += "Content-Type: application/json\r\n"
+    return (head + "\r\n").encode(), data
+
+
+async def _open(scheme, host, addr, port, timeouts):
+    """Open a connection to an address within the connect timeout."""
+    if scheme == "https":
+        connect = uasyncio.open_connection(addr, port, ssl=True, server_hostname=host)
+    else:
+        connect = uasyncio.open_connection(addr, port)
+    return await _phase("connect", connect, timeouts)
+
+
+async def _exchange(reader, writer, method, head, data, timeouts, extract=None):
+    """Send a request and read the whole response.
+
+    Returns:
+        (Response, bool): The response, and whether the server left the
+        connection open for another request.
+    """
+    writer.write(head)
+    if data:
+        writer.write(data)
+    await _phase("send", writer.drain(), timeouts)
+    status, reason, headers = await _phase("headers", _read_head(reader), timeouts)
+    value = None
+    if method == "HEAD" or status in (204, 304):
+        content = b""
+        delimited = True
+    else:
+        if extract:
+            content = b""
+            read = Body(reader, headers).read
+            value = await _phase("body", extract_json(read, extract), timeouts)
+        else:
+            content = await _phase("body", _read_body(reader, headers), timeouts)
+        delimited = "content-length" in headers or "transfer-encoding" in headers
+    keep = delimited and headers.get("connection", "").lower() != "close"
+    return Response(status, reason, headers, content, value), keep
+
+
+async def request(
+    method,
+    url,
+    headers=None,
+    data=None,
+    json=None,
+    timeouts=None,
+    extract=None,
+    addr=None,
+):
+    """Make an HTTP request, yielding to other tasks while it waits.
+
+    Args:
+        method (string): HTTP method.
+        url (string): Full URL.
+        headers (dict): Request headers.
+        data (bytes or string): Request body.
+        json: Object sent as a JSON body.
+        timeouts (dict): Milliseconds for any of the phases in TIMEOUTS.
+        extract (tuple): Object keys of a value to pick out of a JSON body
+            as it arrives, into Response.value, instead of keeping the body.
+        addr (string): The host's IP address, from resolve().  Without it a
+            host name is looked up here, blocking other tasks.
+    Returns:
+        Response: Status, headers and body (HTTP errors are returned too).
+    Raises:
+        HTTPTimeout: A phase took longer than its timeout.
+        OSError: The host could not be reached or closed the connection.
+        KeyError: The extract keys are not in the body.
+    """
+    timeouts = _timeouts(timeouts)
+    scheme, host, port, path = parse_url(url)
+    head, data = _encode(
+        method, path, _netloc(scheme, host, port), headers, data, json, "close"
+    )
+    addr = addr or resolve(host, port)
+    reader, writer = await _open(scheme, host, addr, port, timeouts)
+    try:
+        resp, keep = await _exchange(
+            reader, writer, method, head, data, timeouts, extract
+        )
+        return resp
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def get(url, **kwargs):
+    return await request("GET", url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
+
+
+class Connection(object):
+    """Keep-alive HTTP/1.1 connection to one host.
+
+    The host's address is kept for dns_ttl seconds, and one socket is
+    kept open between requests.  When the server has closed the kept
+    socket in the meantime, the request is sent again on a new one.
+    Addresses are never looked up during a request, as that blocks: call
+    refresh() between requests instead.
+
+    Attributes:
+        requests: Number of requests made
+        reused: Requests answered on a socket kept from an earlier request
+        connects: Sockets opened
+        reconnects: Requests sent again after the kept socket had died
+        lookups: Host address lookups made by refresh()
+        latency_ms: Duration of the last request
+        total_ms: Duration of all requests
+    """
+
+    def __init__(self, base_url, addr=None, dns_ttl=3600, timeouts=None):
+        """Constructor for a kept connection.
+
+        Args:
+            base_url (string): URL that request paths are relative to, eg.
+                http://192.168.1.10:8123
+            addr (string): The host's IP address, from resolve() before
+                the event loop started.  Without it the address is looked
+                up by the first refresh(); a URL with an IP address needs
+                no lookup at all.
+            dns_ttl (int): Seconds to keep the host's address before
+                refresh() looks it up again.  Default is 3600.
+            timeouts (dict): Milliseconds for any of the phases in
+                TIMEOUTS, for every request.
+        """
+        self.scheme, self.host, self.port, path = parse_url(base_url)
+        self.base_path = path.rstrip("/")
+        self.netloc = _netloc(self.scheme, self.host, self.port)
+        self.dns_ttl = dns_ttl
+        self.timeouts = _timeouts(timeouts)
+        self.fixed = self.host.replace(".", "").isdigit()
+        self.addr = self.host if self.fixed else addr
+        self.addr_time = ticks_ms()
+        self.reader = None
+        self.writer = None
+        self.requests = 0
+        self.reused = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.lookups = 0
+        self.latency_ms = 0
+        self.total_ms = 0
+
+    def stale(self):
+        """Return True if refresh() would look the host's address up."""
+        if self.fixed:
+            return False
+        return (
+            self.addr_time is None
+            or self.addr is None
+            or ticks_diff(ticks_ms(), self.addr_time) > self.dns_ttl * 1000
+        )
+
+    def refresh(self):
+        """Look the host's address up again once it is stale.
+
+        The address goes stale after dns_ttl seconds, and as soon as a new
+        socket cannot be opened to it, in case the host has moved.
+        Raises:
+            OSError: The lookup failed.  Any old address is kept, and the
+                next refresh() tries again.
+        Note:
+            getaddrinfo() blocks in MicroPython, stalling every task while
+            it waits, so call this between requests, eg. before each poll,
+            never during one.
+        """
+        if not self.stale():
+            return
+        self.lookups += 1
+        self.addr = resolve(self.host, self.port)
+        self.addr_time = ticks_ms()
+
+    async def connect(self, timeouts):
+        """Open a new socket to the host."""
+        if self.addr is None:
+            raise OSError(f"No address for {self.host} yet - see refresh()")
+        try:
+            self.reader, self.writer = await _open(
+                self.scheme, self.host, self.addr, self.port, timeouts
+            )
+        except Exception:
+            self.addr_time = None  # the host may have moved, so look it up again
+            raise
+        self.connects += 1
+
+    async def close(self):
+        """Close the kept socket, if there is one."""
+        writer = self.writer
+        if writer is not None:
+            self.reader = self.writer = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def request(
+        self,
+        method,
+        path,
+        headers=None,
+        data=None,
+        json=None,
+        timeouts=None,
+        extract=None,
+    ):
+        """Make an HTTP request on the kept socket.
+
+        Args:
+            method (string): HTTP method.
+            path (string): Path after the base URL, eg. /api/states/sun.sun
+            headers (dict): Request headers.
+            data (bytes or string): Request body.
+            json: Object sent as a JSON body.
+            timeouts (dict): Milliseconds for any of the phases in TIMEOUTS.
+            extract (tuple): Object keys of a value to pick out of a JSON
+                body as it arrives, into Response.value, instead of keeping
+                the body.
+        Returns:
+            Response: Status, headers and body (HTTP errors are returned too).
+        Raises:
+            HTTPTimeout: A phase took longer than its timeout.
+            OSError: The host could not be reached or closed the connection.
+            KeyError: The extract keys are not in the body.
+        """
+        timeouts = _timeouts(timeouts, self.timeouts)
+        head, data = _encode(
+            method,
+            self.base_path + path,
+            self.netloc,
+            headers,
+            data,
+            json,
+            "keep-alive",
+        )
+        start = ticks_ms()
+        self.requests += 1
+        resp = None
+        try:
+            if self.writer is not None:
+                self.reused += 1
+                try:
+                    resp, keep = await _exchange(
+                        self.reader, self.writer, method, head, data, timeouts, extract
+                    )
+                except OSError:
+                    # Closed by the server while idle, so try a new socket
+                    await self.close()
+                    self.reused -= 1
+                    self.reconnects += 1
+            if resp is None:
+                await self.connect(timeouts)
+                resp, keep = await _exchange(
+                    self.reader, self.writer, method, head, data, timeouts, extract
+                )
+        except KeyError:
+            raise  # the body was read to the end, so the socket can be kept
+        except Exception:
+            await self.close()  # the socket may be part way through a response
+            raise
+        if not keep:
+            await self.close()
+        self.latency_ms = ticks_diff(ticks_ms(), start)
+        self.total_ms += self.latency_ms
+        return resp
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self):
+        """Return connection statistics.
+
+        Returns:
+            dict: requests, reused, connects, reconnects, lookups, and the
+            last and mean request durations in ms.
+        """
+        return {
+            "requests": self.requests,
+            "reused": self.reused,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "lookups": self.lookups,
+            "latency_ms": self.latency_ms,
+            "mean_ms": self.total_ms // self.requests if self.requests else 0,
+        }
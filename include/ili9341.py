@@ -1,9 +1,13 @@
 """ILI9341 LCD/Touch module."""
 
+from array import array
+from os import stat
 from time import sleep
 from math import cos, sin, pi, radians
+from struct import calcsize, unpack
 from sys import implementation
 from framebuf import FrameBuffer, RGB565  # type: ignore
+from include.lru import LRUCache
 
 
 def color565(r, g, b):
@@ -17,6 +21,186 @@ def color565(r, g, b):
     return (r & 0xF8) << 8 | (g & 0xFC) << 3 | b >> 3
 
 
+class _CachedFile(object):
+    """Read-only file over cached bytes, read as memoryview slices.
+
+    Reads share the cached data rather than copying it, so they must not
+    be kept once the cache could drop the file.
+    """
+
+    def __init__(self, data):
+        self.mv = memoryview(data)
+        self.pos = 0
+
+    def read(self, size=-1):
+        start = self.pos
+        end = len(self.mv) if size < 0 else min(start + size, len(self.mv))
+        self.pos = end
+        return self.mv[start:end]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.mv = None
+
+
+def _merge_rect(rects, rect):
+    """Add a rectangle to a list, merging any it overlaps or touches.
+
+    Args:
+        rects (list): Rectangles as (x0, y0, x1, y1) tuples (inclusive).
+        rect (tuple): Rectangle to add.
+    Note:
+        Merged rectangles are replaced by their bounding box, which may
+        absorb further rectangles, so the loop repeats until stable.
+    """
+    x0, y0, x1, y1 = rect
+    i = 0
+    while i < len(rects):
+        rx0, ry0, rx1, ry1 = rects[i]
+        if rx0 <= x1 + 1 and x0 <= rx1 + 1 and ry0 <= y1 + 1 and y0 <= ry1 + 1:
+            x0 = min(x0, rx0)
+            y0 = min(y0, ry0)
+            x1 = max(x1, rx1)
+            y1 = max(y1, ry1)
+            rects.pop(i)
+            i = 0
+        else:
+            i += 1
+    rects.append((x0, y0, x1, y1))
+
+
+def _join_rect(rects, rect, limit=32):
+    """Add a rectangle to a list, joining neighbours only where exact.
+
+    Args:
+        rects (list): Rectangles as (x0, y0, x1, y1) tuples (inclusive).
+        rect (tuple): Rectangle to add.
+        limit (int): List length after which _merge_rect() takes over.
+    Note:
+        Two rectangles are joined when one contains the other or when they
+        share a full edge, so the list never covers pixels that were not
+        added.  Past the limit precision gives way to bounded cost.
+    """
+    if len(rects) >= limit:
+        _merge_rect(rects, rect)
+        return
+    x0, y0, x1, y1 = rect
+    i = 0
+    while i < len(rects):
+        rx0, ry0, rx1, ry1 = rects[i]
+        if rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1:
+            return
+        if (
+            (x0 <= rx0 and y0 <= ry0 and rx1 <= x1 and ry1 <= y1)
+            or (rx0 == x0 and rx1 == x1 and ry0 <= y1 + 1 and y0 <= ry1 + 1)
+            or (ry0 == y0 and ry1 == y1 and rx0 <= x1 + 1 and x0 <= rx1 + 1)
+        ):
+            x0 = min(x0, rx0)
+            y0 = min(y0, ry0)
+            x1 = max(x1, rx1)
+            y1 = max(y1, ry1)
+            rects.pop(i)
+            i = 0
+        else:
+            i += 1
+    rects.append((x0, y0, x1, y1))
+
+
+def _circle_runs(r):
+    """Return the outline of a midpoint circle as runs of pixels.
+
+    Args:
+        r (int): Radius.
+    Returns:
+        list: Runs as (dx, dy, w, h) tuples relative to the center.
+    Note:
+        Flat parts of the outline become horizontal runs and the pixels
+        left over are joined into vertical runs, so each run is one block.
+    """
+    points = {(0, r), (0, -r), (r, 0), (-r, 0)}
+    f = 1 - r
+    dx = 1
+    dy = -r - r
+    x = 0
+    y = r
+    while x < y:
+        if f >= 0:
+            y -= 1
+            dy += 2
+            f += dy
+        x += 1
+        dx += 2
+        f += dx
+        points.update(
+            (
+                (x, y),
+                (-x, y),
+                (x, -y),
+                (-x, -y),
+                (y, x),
+                (-y, x),
+                (y, -x),
+                (-y, -x),
+            )
+        )
+    runs = []
+    singles = []
+    for y, x, length in _spans(points, 1):
+        if length > 1:
+            runs.append((x, y, length, 1))
+        else:
+            singles.append((x, y))
+    for x, y, length in _spans(singles, 0):
+        runs.append((x, y, 1, length))
+    return runs
+
+
+def _polygon_coords(sides, x0, y0, r, rotate=0):
+    """Return the vertices of a regular polygon, first vertex repeated.
+
+    Args:
+        sides (int): Number of polygon sides.
+        x0, y0 (int): Coordinates of center point.
+        r (int): Radius.
+        rotate (float): Rotation in degrees relative to origin.
+    Returns:
+        list: (x, y) tuples, sides + 1 of them.
+    """
+    theta = radians(rotate)
+    coords = []
+    for s in range(sides + 1):
+        t = 2.0 * pi * s / sides + theta
+        coords.append((int(r * cos(t) + x0), int(r * sin(t) + y0)))
+    return coords
+
+
+def _spans(points, axis):
+    """Group points into spans of consecutive pixels along one axis.
+
+    Args:
+        points (iterable): (a, b) tuples.
+        axis (int): Index of the coordinate held constant within a span.
+    Returns:
+        list: (constant, start, length) tuples.
+    """
+    lines = {}
+    for point in points:
+        lines.setdefault(point[axis], []).append(point[1 - axis])
+    spans = []
+    for key, values in lines.items():
+        values.sort()
+        start = end = values[0]
+        for value in values[1:]:
+            if value != end + 1:
+                spans.append((key, start, end - start + 1))
+                start = value
+            end = value
+        spans.append((key, start, end - start + 1))
+    return spans
+
+
 class Display(object):
     """Serial interface for 16-bit color (5-6-5 RGB) IL9341 display.
 
@@ -83,8 +267,27 @@ class Display(object):
     PUMPRC = const(0xF7)  # Pump ratio control
 
     ROTATE = {0: 0x88, 90: 0xE8, 180: 0x48, 270: 0x28}
-
-    def __init__(self, spi, cs, dc, rst, width=240, height=320, rotation=0):
+    # Bytes in the scratch buffer for solid colour blocks (8 rows of 240)
+    SCRATCH = const(3840)
+    # Smallest pre-tiled buffer kept in the fill cache (128 pixels)
+    FILL_TILE = const(256)
+    # Run length encoded images (see draw_rle_image)
+    RLE_MAGIC = b"RLE1"
+    RLE_HEADER = "<4sHHH"
+
+    def __init__(
+        self,
+        spi,
+        cs,
+        dc,
+        rst,
+        width=240,
+        height=320,
+        rotation=0,
+        shadow=None,
+        fill_cache=4096,
+        image_cache=2048,
+    ):
         """Initialize OLED.
 
         Args:
@@ -95,6 +298,13 @@ class Display(object):
             width (Optional int): Screen width (default 240)
             height (Optional int): Screen height (default 320)
             rotation (Optional int): Rotation must be 0 default, 90. 180 or 270
+            shadow (Optional bool or list): Buffer drawing in RAM until flush().
+                True shadows the whole screen, or pass a list of
+                (x, y, w, h) tiles (default None = draw straight to SPI).
+            fill_cache (Optional int): Bytes of pre-tiled color buffers to
+                keep, least recently used first out (default 4096, 0 = off).
+            image_cache (Optional int): Bytes of image files to keep in RAM,
+                least recently used first out (default 2048, 0 = off).
         """
         self.spi = spi
         self.cs = cs
@@ -102,6 +312,25 @@ class Display(object):
         self.rst = rst
         self.width = width
         self.height = height
+        self.shadow_tiles = []
+        self.tracked = None
+        self.circle_runs = {}  # radius: outline runs from _circle_runs()
+        # Reusable buffers, so drawing does not allocate
+        self.scratch = bytearray(self.SCRATCH)
+        self.scratch_mv = memoryview(self.scratch)
+        self.scratch_color = 0  # a new bytearray is black
+        self.scratch_filled = self.SCRATCH
+        self.cmd_buf = bytearray(1)
+        self.arg_buf = bytearray(16)
+        self.arg_mv = memoryview(self.arg_buf)
+        self.window_buf = bytearray(4)
+        # Per-row edge tables for fill_polygon()
+        self.edge_left = array("h", bytes(2 * height))
+        self.edge_right = array("h", bytes(2 * height))
+        # color: memoryview of pre-tiled pixels, so common fills skip tiling
+        self.fill_cache = LRUCache(max_bytes=fill_cache) if fill_cache else None
+        # path: image file contents, so sprites shown every refresh skip flash
+        self.image_cache = LRUCache(max_bytes=image_cache) if image_cache else None
         if rotation not in self.ROTATE.keys():
             raise RuntimeError("Rotation must be 0, 90, 180 or 270.")
         else:
@@ -184,6 +413,9 @@ class Display(object):
         self.write_cmd(self.DISPLAY_ON)  # Display on
         sleep(0.1)
         self.clear()
+        # Shadow buffers start black, matching the panel after clear()
+        if shadow:
+            self.set_shadow(shadow)
 
     def block(self, x0, y0, x1, y1, data):
         """Write a block of data to display.
@@ -193,16 +425,30 @@ class Display(object):
             y0 (int):  Starting Y position.
             x1 (int):  Ending X position.
             y1 (int):  Ending Y position.
-            data (bytes): Data buffer to write.
+            data (bytes or list): Data buffer to write, or a list of
+                buffers to write one after another.
+        Note:
+            In shadow mode a block that lies within one tile only updates
+            RAM and is sent on flush().  Anything else is written through.
+            Lists are not copied to shadow tiles, so only pass one when
+            shadow_tiles is empty.
         """
-        self.write_cmd(self.SET_COLUMN, x0 >> 8, x0 & 0xFF, x1 >> 8, x1 & 0xFF)
-        self.write_cmd(self.SET_PAGE, y0 >> 8, y0 & 0xFF, y1 >> 8, y1 & 0xFF)
-        self.write_cmd(self.WRITE_RAM)
+        if self.tracked is not None:
+            _join_rect(self.tracked, (x0, y0, x1, y1))
+        if isinstance(data, list):
+            self.set_window(x0, y0, x1, y1)
+            for buf in data:
+                self.write_data(buf)
+            return
+        if self.shadow_tiles and self.shadow_block(x0, y0, x1, y1, data):
+            return
+        self.set_window(x0, y0, x1, y1)
         self.write_data(data)
 
     def cleanup(self):
         """Clean up resources."""
         self.clear()
+        self.flush()
         self.display_off()
         self.spi.deinit()
         print("display off")
@@ -227,13 +473,71 @@ class Display(object):
             hlines > 0 and h % hlines == 0
         ), "hlines must be a non-zero factor of height."
         # Clear display
-        if color:
+        if w * hlines * 2 <= self.SCRATCH:
+            line = self.color_buffer(color, w * hlines)
+        elif color:
             line = color.to_bytes(2, "big") * (w * hlines)
         else:
             line = bytearray(w * 2 * hlines)
         for y in range(0, h, hlines):
             self.block(0, y, w - 1, y + hlines - 1, line)
 
+    def color_buffer(self, color, pixels):
+        """Return pixels of one color from the fill cache or scratch buffer.
+
+        Args:
+            color (int): RGB565 color value.
+            pixels (int): Number of pixels (up to SCRATCH // 2).
+        Returns:
+            memoryview: Pixel data, valid until the next call.
+        Note:
+            The scratch buffer is only filled as far as needed, by doubling
+            the filled part with slice copies, and refilled when the color
+            changes.  A copy of the tiled pixels is then kept in the fill
+            cache, so later fills of the same color are plain SPI writes.
+            Entries are limited to a quarter of the cache so one large fill
+            cannot push out every other color.
+        """
+        size = pixels * 2
+        cache = self.fill_cache
+        if cache is not None:
+            buf = cache.get(color)
+            if buf is not None and len(buf) >= size:
+                return buf[:size]
+        mv = self.scratch_mv
+        fill = size
+        if cache is not None:
+            # Tile at least FILL_TILE bytes, so entries seldom need to grow
+            fill = max(size, min(self.FILL_TILE, cache.max_bytes >> 2))
+        if color != self.scratch_color:
+            mv[0] = color >> 8
+            mv[1] = color & 0xFF
+            self.scratch_color = color
+            self.scratch_filled = 2
+        n = self.scratch_filled
+        if n < fill:
+            while n < fill:
+                step = min(n, fill - n)
+                mv[n : n + step] = mv[:step]
+                n += step
+            self.scratch_filled = n
+        if cache is not None and fill <= cache.max_bytes >> 2:
+            cache.put(color, memoryview(bytearray(mv[:fill])), fill)
+        return mv[:size]
+
+    def command_args(self, args):
+        """Copy command arguments into the reusable argument buffer.
+
+        Args:
+            args (tuple): Argument bytes (16 at most).
+        Returns:
+            memoryview: The arguments.
+        """
+        buf = self.arg_buf
+        for i in range(len(args)):
+            buf[i] = args[i]
+        return self.arg_mv[: len(args)]
+
     def display_off(self):
         """Turn display off."""
         self.write_cmd(self.DISPLAY_OFF)
@@ -250,32 +554,31 @@ class Display(object):
             y0 (int): Y coordinate of center point.
             r (int): Radius.
             color (int): RGB565 color value.
+        Note:
+            The outline is written as runs of pixels (about 28 blocks for
+            r=12 rather than 76 single pixels), clipped to the display.
         """
-        f = 1 - r
-        dx = 1
-        dy = -r - r
-        x = 0
-        y = r
-        self.draw_pixel(x0, y0 + r, color)
-        self.draw_pixel(x0, y0 - r, color)
-        self.draw_pixel(x0 + r, y0, color)
-        self.draw_pixel(x0 - r, y0, color)
-        while x < y:
-            if f >= 0:
-                y -= 1
-                dy += 2
-                f += dy
-            x += 1
-            dx += 2
-            f += dx
-            self.draw_pixel(x0 + x, y0 + y, color)
-            self.draw_pixel(x0 - x, y0 + y, color)
-            self.draw_pixel(x0 + x, y0 - y, color)
-            self.draw_pixel(x0 - x, y0 - y, color)
-            self.draw_pixel(x0 + y, y0 + x, color)
-            self.draw_pixel(x0 - y, y0 + x, color)
-            self.draw_pixel(x0 + y, y0 - x, color)
-            self.draw_pixel(x0 - y, y0 - x, color)
+        runs = self.circle_runs.get(r)
+        if runs is None:
+            if len(self.circle_runs) >= 4:
+                self.circle_runs = {}
+            runs = self.circle_runs[r] = _circle_runs(r)
+        clip = self.is_off_grid(x0 - r, y0 - r, x0 + r, y0 + r)
+        for dx, dy, w, h in runs:
+            x = x0 + dx
+            y = y0 + dy
+            x1 = x + w - 1
+            y1 = y + h - 1
+            if clip:
+                x = max(x, 0)
+                y = max(y, 0)
+                x1 = min(x1, self.width - 1)
+                y1 = min(y1, self.height - 1)
+                if x > x1 or y > y1:
+                    continue
+            self.block(
+                x, y, x1, y1, self.color_buffer(color, (x1 - x + 1) * (y1 - y + 1))
+            )
 
     def draw_ellipse(self, x0, y0, a, b, color):
         """Draw an ellipse.
@@ -346,8 +649,7 @@ class Display(object):
         """
         if self.is_off_grid(x, y, x + w - 1, y):
             return
-        line = color.to_bytes(2, "big") * w
-        self.block(x, y, x + w - 1, y, line)
+        self.block(x, y, x + w - 1, y, self.color_buffer(color, w))
 
     def draw_image(self, path, x=0, y=0, w=320, h=240):
         """Draw image from flash.
@@ -363,7 +665,7 @@ class Display(object):
         y2 = y + h - 1
         if self.is_off_grid(x, y, x2, y2):
             return
-        with open(path, "rb") as f:
+        with self.image_file(path) as f:
             chunk_height = 1024 // w
             chunk_count, remainder = divmod(h, chunk_height)
             chunk_size = chunk_height * w * 2
@@ -431,6 +733,9 @@ class Display(object):
             x1, y1 (int): Starting coordinates of the line
             x2, y2 (int): Ending coordinates of the line
             color (int): RGB565 color value.
+        Note:
+            Diagonal lines are written a run of pixels at a time, so a line
+            costs one block per step of its shorter axis.
         """
         # Check for horizontal line
         if y1 == y2:
@@ -467,14 +772,17 @@ class Display(object):
         error = dx >> 1
         ystep = 1 if y1 < y2 else -1
         y = y1
+        # Pixels on the same row (column if steep) are sent as one block
+        start = x1
         for x in range(x1, x2 + 1):
-            # Had to reverse HW ????
-            if not is_steep:
-                self.draw_pixel(x, y, color)
-            else:
-                self.draw_pixel(y, x, color)
             error -= abs(dy)
-            if error < 0:
+            if error < 0 or x == x2:
+                run = self.color_buffer(color, x - start + 1)
+                if not is_steep:
+                    self.block(start, y, x, y, run)
+                else:
+                    self.block(y, start, y, x, run)
+                start = x + 1
                 y += ystep
                 error += dx
 
@@ -503,7 +811,7 @@ class Display(object):
         """
         if self.is_off_grid(x, y, x, y):
             return
-        self.block(x, y, x, y, color.to_bytes(2, "big"))
+        self.block(x, y, x, y, self.color_buffer(color, 1))
 
     def draw_polygon(self, sides, x0, y0, r, color, rotate=0):
         """Draw an n-sided regular polygon.
@@ -519,14 +827,7 @@ class Display(object):
             Since pixels are not divisible, the radius is integer rounded
             up to complete on a full pixel.  Therefore diameter = 2 x r + 1.
         """
-        coords = []
-        theta = radians(rotate)
-        n = sides + 1
-        for s in range(n):
-            t = 2.0 * pi * s / sides + theta
-            coords.append([int(r * cos(t) + x0), int(r * sin(t) + y0)])
-
-        # Cast to python float first to fix rounding errors
+        coords = _polygon_coords(sides, x0, y0, r, rotate)
         self.draw_lines(coords, color=color)
 
     def draw_rectangle(self, x, y, w, h, color):
@@ -546,6 +847,79 @@ class Display(object):
         self.draw_vline(x, y, h, color)
         self.draw_vline(x2, y, h, color)
 
+    def draw_rle_image(self, path, x=0, y=0):
+        """Draw a run length encoded image from flash.
+
+        Args:
+            path (string): Image file path.
+            x (int): X coordinate of image left.  Default is 0.
+            y (int): Y coordinate of image top.  Default is 0.
+        Note:
+            Convert images with utils/img2rgb565.py --rle.  The layout is
+            (little endian):
+                4s  magic b'RLE1'
+                H   width
+                H   height
+                H   palette size (256 at most)
+                >H  RGB565 color of each palette entry, big endian as sent
+                BB  length - 1 and palette index of each run of pixels,
+                    row by row from the top left
+            Runs are expanded into the scratch buffer and sent a few rows
+            at a time.  Runs covering two or more whole rows are sent as
+            solid fills instead.
+        """
+        with self.image_file(path) as f:
+            magic, w, h, colors = unpack(
+                self.RLE_HEADER, f.read(calcsize(self.RLE_HEADER))
+            )
+            if magic != self.RLE_MAGIC:
+                raise ValueError("Not an RLE image file: " + path)
+            x2 = x + w - 1
+            if self.is_off_grid(x, y, x2, y + h - 1):
+                return
+            palette = f.read(colors * 2)
+            row_bytes = w * 2
+            chunk = self.SCRATCH // row_bytes * row_bytes
+            mv = self.scratch_mv
+            self.scratch_color = None  # the scratch buffer is reused below
+            pos = 0  # bytes of decoded rows in the scratch buffer
+            row = y  # screen row of the first of them
+            while True:
+                runs = f.read(256)
+                if not runs:
+                    break
+                for i in range(0, len(runs) - 1, 2):
+                    n = (runs[i] + 1) * 2
+                    c = runs[i + 1] * 2
+                    while n:
+                        solid = pos % row_bytes == 0 and n >= row_bytes * 2
+                        if pos and (solid or pos == chunk):
+                            rows = pos // row_bytes
+                            self.block(x, row, x2, row + rows - 1, mv[:pos])
+                            row += rows
+                            pos = 0
+                        if solid:
+                            rows = n // row_bytes
+                            color = palette[c] << 8 | palette[c + 1]
+                            self.fill_hrect(x, row, w, rows, color)
+                            self.scratch_color = None
+                            row += rows
+                            n -= rows * row_bytes
+                            continue
+                        # Write one pixel, then double it up to the run length
+                        end = pos + min(n, chunk - pos)
+                        mv[pos] = palette[c]
+                        mv[pos + 1] = palette[c + 1]
+                        k = pos + 2
+                        while k < end:
+                            step = min(k - pos, end - k)
+                            mv[k : k + step] = mv[pos : pos + step]
+                            k += step
+                        n -= end - pos
+                        pos = end
+            if pos:
+                self.block(x, row, x2, row + pos // row_bytes - 1, mv[:pos])
+
     def draw_sprite(self, buf, x, y, w, h):
         """Draw a sprite (optimized for horizontal drawing).
 
@@ -586,9 +960,14 @@ class Display(object):
             landscape (bool): Orientation (default: False = portrait)
             rotate_180 (bool): Rotate text by 180 degrees
             spacing (int): Pixels between letters (default: 1)
+        Note:
+            Unrotated text is drawn by draw_text_run(), spacing included, in
+            one window where it can be.
         """
-        iterable_text = reversed(text) if rotate_180 else text
-        for letter in iterable_text:
+        if not rotate_180:
+            self.draw_text_run(x, y, text, font, color, background, landscape, spacing)
+            return
+        for letter in reversed(text):
             # Get letter array and letter dimensions
             w, h = self.draw_letter(
                 x, y, letter, font, color, background, landscape, rotate_180
@@ -617,6 +996,131 @@ class Display(object):
                 # # Position x for next letter
                 # x += w + spacing
 
+    def draw_text_run(
+        self, x, y, text, font, color, background=0, landscape=False, spacing=1
+    ):
+        """Draw text with as few windows as possible.
+
+        Args:
+            x (int): Starting X position
+            y (int): Starting Y position
+            text (string): Text to draw
+            font (XglcdFont object): Font
+            color (int): RGB565 color value
+            background (int): RGB565 background color (default: black)
+            landscape (bool): Orientation (default: False = portrait)
+            spacing (int): Pixels between letters (default: 1)
+        Note:
+            Covers the same pixels as drawing letter by letter: in landscape
+            the text runs up the screen from y, otherwise right from x, and
+            stops at a missing letter or one that would leave the display.
+            Landscape letters are sent straight from the font cache into one
+            window.  Portrait rows interleave, so letters are composed in the
+            scratch buffer a few at a time, unless there is only one.
+        """
+        h = font.height
+        limit = y if landscape else self.width - x
+        glyphs = []  # (buffer, width, spacing after it) of the letters that fit
+        run = 0
+        for letter in text:
+            buf, w, _ = font.get_letter(letter, color, background, landscape)
+            if w == 0:
+                break
+            if landscape:
+                rect = (x, y - run - w, x + h - 1, y - run - 1)
+            else:
+                rect = (x + run, y, x + run + w - 1, y + h - 1)
+            if (
+                rect[0] < 0
+                or rect[1] < 0
+                or rect[2] >= self.width
+                or rect[3] >= self.height
+            ):
+                self.is_off_grid(*rect)  # prints which edge
+                break
+            # Spacing past the edge is left out, as fill_hrect() would
+            gap = spacing if run + w + spacing <= limit else 0
+            glyphs.append((buf, w, gap))
+            run += w + gap
+        if len(glyphs) < len(text):
+            print("Invalid width {0} or height {1}".format(0, 0))
+        if landscape and glyphs and not self.shadow_tiles:
+            # Rows run up the screen, so the last letter is written first
+            data = []
+            for buf, w, gap in reversed(glyphs):
+                if gap:
+                    data.append(self.color_buffer(background, gap * h))
+                data.append(buf)
+            self.block(x, y - run, x + h - 1, y - 1, data)
+            return
+        mv = self.scratch_mv
+        pitch = h * 2
+        start = 0
+        offset = 0
+        while start < len(glyphs):
+            # Take as many letters as fit in the scratch buffer
+            end = start
+            size = 0
+            while end < len(glyphs):
+                n = size + glyphs[end][1] + glyphs[end][2]
+                if end > start and n * pitch > self.SCRATCH:
+                    break
+                size = n
+                end += 1
+            if end == start + 1 and (len(glyphs) == 1 or size * pitch > self.SCRATCH):
+                # A letter on its own is sent from the font cache
+                buf, w, gap = glyphs[start]
+                if landscape:
+                    bottom = y - offset - 1
+                    self.block(x, bottom - w + 1, x + h - 1, bottom, buf)
+                    if gap:
+                        self.fill_hrect(x, bottom - w - gap + 1, h, gap, background)
+                else:
+                    left = x + offset
+                    self.block(left, y, left + w - 1, y + h - 1, buf)
+                    if gap:
+                        self.fill_hrect(left + w, y, gap, h, background)
+                offset += w + gap
+                start = end
+                continue
+            self.scratch_color = None  # the scratch buffer is reused below
+            if spacing:
+                # Spacing is left as background around the letters
+                mv[0] = background >> 8
+                mv[1] = background & 0xFF
+                n = 2
+                while n < size * pitch:
+                    step = min(n, size * pitch - n)
+                    mv[n : n + step] = mv[:step]
+                    n += step
+            if landscape:
+                # Top row first, so the last letter of the chunk comes first
+                pos = 0
+                for buf, w, gap in reversed(glyphs[start:end]):
+                    pos += gap * pitch
+                    mv[pos : pos + w * pitch] = buf
+                    pos += w * pitch
+                bottom = y - offset - 1
+                self.block(x, bottom - size + 1, x + h - 1, bottom, mv[: size * pitch])
+            else:
+                # Copy letters row by row into a chunk-wide buffer
+                row = size * 2
+                pos = 0
+                for buf, w, gap in glyphs[start:end]:
+                    buf = memoryview(buf)
+                    n = w * 2
+                    dst = pos
+                    src = 0
+                    for _ in range(h):
+                        mv[dst : dst + n] = buf[src : src + n]
+                        dst += row
+                        src += n
+                    pos += (w + gap) * 2
+                left = x + offset
+                self.block(left, y, left + size - 1, y + h - 1, mv[: size * pitch])
+            offset += size
+            start = end
+
     def draw_text8x8(self, x, y, text, color, background=0, rotate=0):
         """Draw text using built-in MicroPython 8x8 bit font.
 
@@ -681,8 +1185,7 @@ class Display(object):
         # Confirm coordinates in boundary
         if self.is_off_grid(x, y, x, y + h - 1):
             return
-        line = color.to_bytes(2, "big") * h
-        self.block(x, y, x, y + h - 1, line)
+        self.block(x, y, x, y + h - 1, self.color_buffer(color, h))
 
     def fill_circle(self, x0, y0, r, color):
         """Draw a filled circle.
@@ -775,18 +1278,18 @@ class Display(object):
         """
         if self.is_off_grid(x, y, x + w - 1, y + h - 1):
             return
-        chunk_height = 1024 // w
+        chunk_height = self.SCRATCH // 2 // w
         chunk_count, remainder = divmod(h, chunk_height)
         chunk_size = chunk_height * w
         chunk_y = y
         if chunk_count:
-            buf = color.to_bytes(2, "big") * chunk_size
+            buf = self.color_buffer(color, chunk_size)
             for c in range(0, chunk_count):
                 self.block(x, chunk_y, x + w - 1, chunk_y + chunk_height - 1, buf)
                 chunk_y += chunk_height
 
         if remainder:
-            buf = color.to_bytes(2, "big") * remainder * w
+            buf = self.color_buffer(color, remainder * w)
             self.block(x, chunk_y, x + w - 1, chunk_y + remainder - 1, buf)
 
     def fill_rectangle(self, x, y, w, h, color):
@@ -819,74 +1322,74 @@ class Display(object):
             The center point is the center of the x0,y0 pixel.
             Since pixels are not divisible, the radius is integer rounded
             up to complete on a full pixel.  Therefore diameter = 2 x r + 1.
+            Sides are walked with integer steps into per-row edge tables,
+            and rows with the same span are filled as one block.
         """
         # Determine side coordinates
-        coords = []
-        theta = radians(rotate)
-        n = sides + 1
-        for s in range(n):
-            t = 2.0 * pi * s / sides + theta
-            coords.append([int(r * cos(t) + x0), int(r * sin(t) + y0)])
-        # Starting point
+        coords = _polygon_coords(sides, x0, y0, r, rotate)
+        # Edge tables: leftmost and rightmost outline pixel of each screen
+        # row.  Rows off the panel draw nothing, so they are left out.
+        top = max(min(y for x, y in coords), 0)
+        bottom = min(max(y for x, y in coords), self.height - 1)
+        if top > bottom:
+            return
+        left = self.edge_left
+        right = self.edge_right
+        for row in range(top, bottom + 1):
+            left[row] = self.width
+            right[row] = -1
         x1, y1 = coords[0]
-        # Minimum Maximum X dict
-        xdict = {y1: [x1, x1]}
-        # Iterate through coordinates
-        for row in coords[1:]:
-            x2, y2 = row
+        for x2, y2 in coords[1:]:
             xprev, yprev = x2, y2
-            # Calculate perimeter
-            # Check for horizontal side
-            if y1 == y2:
-                if x1 > x2:
-                    x1, x2 = x2, x1
-                if y1 in xdict:
-                    xdict[y1] = [min(x1, xdict[y1][0]), max(x2, xdict[y1][1])]
-                else:
-                    xdict[y1] = [x1, x2]
-                x1, y1 = xprev, yprev
-                continue
-            # Non horizontal side
-            # Changes in x, y
-            dx = x2 - x1
-            dy = y2 - y1
-            # Determine how steep the line is
-            is_steep = abs(dy) > abs(dx)
-            # Rotate line
+            # Walk the side with Bresenham's algorithm in row order
+            dx = abs(x2 - x1)
+            dy = abs(y2 - y1)
+            is_steep = dy > dx
             if is_steep:
                 x1, y1 = y1, x1
                 x2, y2 = y2, x2
-            # Swap start and end points if necessary
+                dx, dy = dy, dx
             if x1 > x2:
                 x1, x2 = x2, x1
                 y1, y2 = y2, y1
-            # Recalculate differentials
-            dx = x2 - x1
-            dy = y2 - y1
-            # Calculate error
             error = dx >> 1
             ystep = 1 if y1 < y2 else -1
             y = y1
-            # Calcualte minimum and maximum x values
             for x in range(x1, x2 + 1):
                 if is_steep:
-                    if x in xdict:
-                        xdict[x] = [min(y, xdict[x][0]), max(y, xdict[x][1])]
-                    else:
-                        xdict[x] = [y, y]
+                    row, col = x, y
                 else:
-                    if y in xdict:
-                        xdict[y] = [min(x, xdict[y][0]), max(x, xdict[y][1])]
-                    else:
-                        xdict[y] = [x, x]
-                error -= abs(dy)
+                    row, col = y, x
+                if top <= row <= bottom:
+                    if col < left[row]:
+                        left[row] = col
+                    if col > right[row]:
+                        right[row] = col
+                error -= dy
                 if error < 0:
                     y += ystep
                     error += dx
             x1, y1 = xprev, yprev
-        # Fill polygon
-        for y, x in xdict.items():
-            self.draw_hline(x[0], y, x[1] - x[0] + 2, color)
+        # Fill polygon, merging runs of rows with the same span into a block
+        start = top
+        for row in range(top + 1, bottom + 2):
+            if (
+                row <= bottom
+                and left[row] == left[start]
+                and right[row] == right[start]
+            ):
+                continue
+            x = left[start]
+            w = right[start] - x + 2
+            y = start
+            h = row - start
+            if self.is_off_grid(x, y, x + w - 1, y + h - 1):
+                # Keep whichever rows fit, as draw_hline() would
+                for line in range(y, y + h):
+                    self.draw_hline(x, line, w, color)
+            else:
+                self.fill_rectangle(x, y, w, h, color)
+            start = row
 
     def fill_vrect(self, x, y, w, h, color):
         """Draw a filled rectangle (optimized for vertical drawing).
@@ -900,20 +1403,67 @@ class Display(object):
         """
         if self.is_off_grid(x, y, x + w - 1, y + h - 1):
             return
-        chunk_width = 1024 // h
+        chunk_width = self.SCRATCH // 2 // h
         chunk_count, remainder = divmod(w, chunk_width)
         chunk_size = chunk_width * h
         chunk_x = x
         if chunk_count:
-            buf = color.to_bytes(2, "big") * chunk_size
+            buf = self.color_buffer(color, chunk_size)
             for c in range(0, chunk_count):
                 self.block(chunk_x, y, chunk_x + chunk_width - 1, y + h - 1, buf)
                 chunk_x += chunk_width
 
         if remainder:
-            buf = color.to_bytes(2, "big") * remainder * h
+            buf = self.color_buffer(color, remainder * h)
             self.block(chunk_x, y, chunk_x + remainder - 1, y + h - 1, buf)
 
+    def flush(self):
+        """Send the dirty regions of the shadow buffer to the display.
+
+        Note:
+            Each dirty rectangle costs one window setup.  Rows are streamed
+            straight from the tile buffer, so nothing is copied.
+        """
+        for tx0, ty0, tx1, ty1, buf, dirty in self.shadow_tiles:
+            mv = memoryview(buf)
+            pitch = (tx1 - tx0 + 1) * 2
+            while dirty:
+                x0, y0, x1, y1 = dirty.pop()
+                self.set_window(x0, y0, x1, y1)
+                start = (y0 - ty0) * pitch + (x0 - tx0) * 2
+                if x0 == tx0 and x1 == tx1:
+                    # Full width rows are contiguous in the tile
+                    self.write_data(mv[start : start + (y1 - y0 + 1) * pitch])
+                    continue
+                n = (x1 - x0 + 1) * 2
+                for _ in range(y0, y1 + 1):
+                    self.write_data(mv[start : start + n])
+                    start += pitch
+
+    def image_file(self, path):
+        """Open an image file, from the image cache when it fits.
+
+        Args:
+            path (string): Image file path.
+        Returns:
+            The open file, or a reader over its cached contents that
+            returns memoryview slices of them without copying.
+        Note:
+            Files larger than the whole cache are read from flash each
+            time.  image_cache.stats() gives the hits and misses.
+        """
+        cache = self.image_cache
+        if cache is not None:
+            data = cache.get(path)
+            if data is None:
+                size = stat(path)[6]
+                if size <= cache.max_bytes:
+                    with open(path, "rb") as f:
+                        data = cache.put(path, f.read(), size)
+            if data is not None:
+                return _CachedFile(data)
+        return open(path, "rb")
+
     def is_off_grid(self, xmin, ymin, xmax, ymax):
         """Check if coordinates extend past display boundaries.
 
@@ -950,11 +1500,13 @@ class Display(object):
             path (string): Image file path.
             w (int): Width of image.
             h (int): Height of image.
+        Returns:
+            bytes, or a read-only memoryview when the file is cached.
         Notes:
             w x h cannot exceed 2048
         """
         buf_size = w * h * 2
-        with open(path, "rb") as f:
+        with self.image_file(path) as f:
             return f.read(buf_size)
 
     def reset_cpy(self):
@@ -1005,6 +1557,100 @@ class Display(object):
                 bottom & 0xFF,
             )
 
+    def set_shadow(self, tiles):
+        """Enable shadow buffering for the whole screen or a set of tiles.
+
+        Args:
+            tiles (bool or list): True for the whole screen, a list of
+                (x, y, w, h) tiles, or False/None to disable.
+        Note:
+            A full 240x320 screen needs 153,600 bytes, which only fits on
+            boards with PSRAM.  Tiles should not overlap.  Any pending
+            dirty regions are flushed before the tiles are replaced.
+        """
+        self.flush()
+        self.shadow_tiles = []
+        if tiles is True:
+            tiles = [(0, 0, self.width, self.height)]
+        for x, y, w, h in tiles or ():
+            if self.is_off_grid(x, y, x + w - 1, y + h - 1):
+                raise ValueError("Shadow tile must fit on the display.")
+            # Tiles mirror the panel, which is black after clear()
+            self.shadow_tiles.append(
+                (x, y, x + w - 1, y + h - 1, bytearray(w * h * 2), [])
+            )
+
+    def set_window(self, x0, y0, x1, y1):
+        """Set the display RAM window and start a memory write.
+
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+        """
+        buf = self.window_buf
+        buf[0] = x0 >> 8
+        buf[1] = x0 & 0xFF
+        buf[2] = x1 >> 8
+        buf[3] = x1 & 0xFF
+        self.write_cmd(self.SET_COLUMN)
+        self.write_data(buf)
+        buf[0] = y0 >> 8
+        buf[1] = y0 & 0xFF
+        buf[2] = y1 >> 8
+        buf[3] = y1 & 0xFF
+        self.write_cmd(self.SET_PAGE)
+        self.write_data(buf)
+        self.write_cmd(self.WRITE_RAM)
+
+    def shadow_block(self, x0, y0, x1, y1, data):
+        """Copy a block of data into any shadow tiles it overlaps.
+
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+            data (bytes): Data buffer to write.
+        Returns:
+            boolean: True if the block lies within one tile, so the caller
+                can skip the SPI write until flush().
+        Note:
+            Only rows whose pixels actually change are marked dirty.
+        """
+        src = memoryview(data)
+        src_pitch = (x1 - x0 + 1) * 2
+        # Short buffers (e.g. a truncated image read) only cover some rows
+        y1 = min(y1, y0 + len(data) // src_pitch - 1)
+        absorbed = False
+        for tx0, ty0, tx1, ty1, buf, dirty in self.shadow_tiles:
+            ix0 = max(x0, tx0)
+            ix1 = min(x1, tx1)
+            iy0 = max(y0, ty0)
+            iy1 = min(y1, ty1)
+            if ix0 > ix1 or iy0 > iy1:
+                continue
+            inside = ix0 == x0 and ix1 == x1 and iy0 == y0 and iy1 == y1
+            pitch = (tx1 - tx0 + 1) * 2
+            n = (ix1 - ix0 + 1) * 2
+            s = (iy0 - y0) * src_pitch + (ix0 - x0) * 2
+            d = (iy0 - ty0) * pitch + (ix0 - tx0) * 2
+            first = last = -1
+            for y in range(iy0, iy1 + 1):
+                if buf[d : d + n] != src[s : s + n]:
+                    buf[d : d + n] = src[s : s + n]
+                    if first < 0:
+                        first = y
+                    last = y
+                s += src_pitch
+                d += pitch
+            # Written-through blocks already reached the panel
+            if inside and first >= 0:
+                _merge_rect(dirty, (ix0, first, ix1, last))
+            absorbed = absorbed or inside
+        return absorbed
+
     def sleep(self, enable=True):
         """Enters or exits sleep mode.
 
@@ -1016,6 +1662,20 @@ class Display(object):
         else:
             self.write_cmd(self.SLPOUT)
 
+    def track_bounds(self):
+        """Start recording the area covered by block writes."""
+        self.tracked = []
+
+    def tracked_bounds(self):
+        """Stop recording and return the area written since track_bounds().
+
+        Returns:
+            list: Rectangles as (x0, y0, x1, y1) tuples (inclusive).
+        """
+        rects = self.tracked or []
+        self.tracked = None
+        return rects
+
     def write_cmd_mpy(self, command, *args):
         """Write command to OLED (MicroPython).
 
@@ -1023,13 +1683,14 @@ class Display(object):
             command (byte): ILI9341 command code.
             *args (optional bytes): Data to transmit.
         """
+        self.cmd_buf[0] = command
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([command]))
+        self.spi.write(self.cmd_buf)
         self.cs(1)
         # Handle any passed data
         if len(args) > 0:
-            self.write_data(bytearray(args))
+            self.write_data(self.command_args(args))
 
     def write_cmd_cpy(self, command, *args):
         """Write command to OLED (CircuitPython).
@@ -1043,12 +1704,13 @@ class Display(object):
         # Confirm SPI locked before writing
         while not self.spi.try_lock():
             pass
-        self.spi.write(bytearray([command]))
+        self.cmd_buf[0] = command
+        self.spi.write(self.cmd_buf)
         self.spi.unlock()
         self.cs.value = True
         # Handle any passed data
         if len(args) > 0:
-            self.write_data(bytearray(args))
+            self.write_data(self.command_args(args))
 
     def write_data_mpy(self, data):
         """Write data to OLED (MicroPython).
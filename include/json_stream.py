@@ -0,0 +1,204 @@
+"""Pick one value out of a JSON document as it streams in."""
+
+from json import loads
+
+QUOTE = const(0x22)  # "
+COMMA = const(0x2C)
+COLON = const(0x3A)
+OPEN_OBJECT = const(0x7B)  # {
+CLOSE_OBJECT = const(0x7D)
+OPEN_ARRAY = const(0x5B)  # [
+CLOSE_ARRAY = const(0x5D)
+WHITESPACE = b" \t\r\n"
+MAX_DEPTH = const(32)
+
+
+class Extractor(object):
+    """Push parser that keeps only the value at a path of object keys.
+
+    Everything else in the document is skipped without being built: the
+    parser only tracks nesting, and reads the keys of the objects along
+    the path.  The text of the wanted value is collected (up to max_bytes)
+    and parsed with json.loads() once it is complete.
+
+    Attributes:
+        keys: Object keys leading to the value, as bytes
+        done: True once the value is complete, or known to be missing
+        found: True when the value was found
+        value: The parsed value
+    """
+
+    def __init__(self, keys, max_bytes=2048):
+        """Constructor for the extractor.
+
+        Args:
+            keys (tuple): Object keys leading to the value, eg.
+                ("attributes", "info").
+            max_bytes (int): Longest value text to collect.  Default is
+                2048.
+        """
+        self.keys = [key.encode() for key in keys]
+        self.max_bytes = max_bytes
+        self.stack = bytearray(MAX_DEPTH)  # opening bracket of each container
+        self.depth = 0
+        self.matched = 0  # keys matched by the open containers
+        self.key_next = False  # the next string is an object key
+        self.in_string = False
+        self.escape = False
+        self.key = None  # bytes of a key that may be on the path
+        self.key_matched = False  # the value after the colon is on the path
+        self.capture = None  # text of the wanted value so far
+        self.capture_depth = 0
+        self.done = False
+        self.found = False
+        self.value = None
+
+    def collect(self, data):
+        """Add text to the value or key being collected."""
+        if self.capture is not None:
+            self.capture += data
+            if len(self.capture) > self.max_bytes:
+                raise ValueError("JSON value longer than %d bytes" % self.max_bytes)
+        elif self.key is not None:
+            self.key += data
+
+    def finish(self):
+        """Parse the collected value."""
+        self.value = loads(self.capture)
+        self.capture = None
+        self.found = True
+        self.done = True
+
+    def feed(self, data):
+        """Scan the next piece of the document.
+
+        Args:
+            data (bytes): Next bytes of the document.
+        Returns:
+            bool: True once the value is complete or known to be missing.
+        """
+        i = 0
+        n = len(data)
+        start = 0  # start of text to collect in this piece
+        while i < n and not self.done:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    i += 1
+                    continue
+                # Skip straight to the next quote or backslash
+                q = data.find(b'"', i)
+                b = data.find(b"\\", i, q if q >= 0 else n)
+                if b >= 0:
+                    self.escape = True
+                    i = b + 1
+                elif q >= 0:
+                    self.in_string = False
+                    i = q + 1
+                    if self.key is not None:
+                        self.key += data[start:q]
+                        self.key_matched = self.key == self.keys[self.matched]
+                        self.key = None
+                    elif self.capture is not None and self.depth == self.capture_depth:
+                        self.collect(data[start:i])
+                        self.finish()
+                else:
+                    i = n
+                continue
+            c = data[i]
+            if c in WHITESPACE:
+                if self.capture is not None and self.depth == self.capture_depth:
+                    self.collect(data[start:i])  # end of a number or literal
+                    self.finish()
+                i += 1
+                continue
+            if (
+                self.key_matched
+                and self.capture is None
+                and c != COLON
+                and self.depth == self.matched + 1
+            ):
+                # First character of the value of a key on the path
+                self.key_matched = False
+                if self.matched + 1 == len(self.keys):
+                    self.capture = bytearray()
+                    self.capture_depth = self.depth
+                    start = i
+                elif c == OPEN_OBJECT:
+                    self.matched += 1
+                else:
+                    self.done = True  # the path leads through a non-object
+                    break
+            if c == QUOTE:
+                self.in_string = True
+                if (
+                    self.key_next
+                    and self.capture is None
+                    and self.depth == self.matched + 1
+                ):
+                    self.key = bytearray()
+                    start = i + 1
+            elif c == OPEN_OBJECT or c == OPEN_ARRAY:
+                if self.depth == MAX_DEPTH:
+                    raise ValueError("JSON nested too deeply")
+                self.stack[self.depth] = c
+                self.depth += 1
+                self.key_next = c == OPEN_OBJECT
+            elif c == CLOSE_OBJECT or c == CLOSE_ARRAY:
+                if self.capture is not None and self.depth == self.capture_depth:
+                    self.collect(data[start:i])  # number or literal
+                    self.finish()
+                    break
+                self.depth -= 1
+                self.key_next = False
+                if self.capture is not None and self.depth == self.capture_depth:
+                    self.collect(data[start : i + 1])
+                    self.finish()
+                elif self.depth <= self.matched:
+                    self.done = True  # left an object on the path
+            elif c == COMMA:
+                if self.capture is not None and self.depth == self.capture_depth:
+                    self.collect(data[start:i])
+                    self.finish()
+                    break
+                self.key_next = (
+                    self.depth > 0 and self.stack[self.depth - 1] == OPEN_OBJECT
+                )
+            elif c == COLON:
+                self.key_next = False
+            i += 1
+        if self.in_string and self.key is not None:
+            self.key += data[start:n]
+        elif self.capture is not None:
+            self.collect(data[start:n])
+        return self.done
+
+
+async def extract(read, keys, max_bytes=2048, chunk=256):
+    """Read a JSON document from a stream and return one value from it.
+
+    The whole stream is read, so a kept-alive connection is left ready for
+    the next response, but at most chunk bytes of it at a time.
+
+    Args:
+        read (function): Coroutine function returning up to n bytes of the
+            document, and b"" at its end.
+        keys (tuple): Object keys leading to the value.
+        max_bytes (int): Longest value text to collect.  Default is 2048.
+        chunk (int): Bytes read at a time.  Default is 256.
+    Returns:
+        The parsed value.
+    Raises:
+        KeyError: The document has no value at that path.
+        ValueError: The value is too long or not valid JSON.
+    """
+    extractor = Extractor(keys, max_bytes)
+    while True:
+        data = await read(chunk)
+        if not data:
+            break
+        if not extractor.done:
+            extractor.feed(data)
+    if not extractor.found:
+        raise KeyError(".".join(keys))
+    return extractor.value
@@ -0,0 +1,123 @@
+"""Least recently used cache with item and byte budgets."""
+
+
+class LRUCache(object):
+    """Bounded cache that evicts the least recently used entries.
+
+    Attributes:
+        max_items: Maximum number of entries (0 = unlimited)
+        max_bytes: Maximum total size of entries (0 = unlimited)
+        size: Current total size of entries
+        hits: Number of successful lookups
+        misses: Number of failed lookups
+        evictions: Number of entries dropped to stay within budget
+
+    Note:
+        MicroPython dicts do not keep insertion order, so recency is held
+        in a separate list.  Caches here hold tens of entries at most, so
+        the linear list operations are cheaper than anything cleverer.
+        Values must not be None, which get() uses to signal a miss.
+    """
+
+    def __init__(self, max_items=0, max_bytes=0):
+        """Constructor for LRU cache.
+
+        Args:
+            max_items (int): Maximum number of entries (default 0 = no limit)
+            max_bytes (int): Maximum total size (default 0 = no limit)
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.order = []  # least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """Drop every entry (statistics are kept)."""
+        self.entries = {}
+        self.order = []
+        self.size = 0
+
+    def get(self, key, default=None):
+        """Look up an entry and mark it as most recently used.
+
+        Args:
+            key: Entry key.
+            default: Value returned when the key is missing.
+        Returns:
+            Cached value or default.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        order = self.order
+        if order[-1] != key:
+            order.remove(key)
+            order.append(key)
+        return entry[0]
+
+    def put(self, key, value, size=0):
+        """Store an entry, evicting older ones to stay within budget.
+
+        Args:
+            key: Entry key.
+            value: Value to cache.
+            size (int): Size of the value in bytes (default 0).
+        Returns:
+            The value, so callers can cache and use it in one step.
+        Note:
+            A value larger than the whole byte budget is not cached.
+        """
+        self.pop(key)
+        if self.max_bytes and size > self.max_bytes:
+            return value
+        while self.order and (
+            (self.max_items and len(self.order) >= self.max_items)
+            or (self.max_bytes and self.size + size > self.max_bytes)
+        ):
+            self.pop(self.order[0])
+            self.evictions += 1
+        self.entries[key] = (value, size)
+        self.order.append(key)
+        self.size += size
+        return value
+
+    def pop(self, key):
+        """Remove an entry if present.
+
+        Args:
+            key: Entry key.
+        Returns:
+            Cached value or None.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.order.remove(key)
+        self.size -= entry[1]
+        return entry[0]
+
+    def stats(self):
+        """Return cache statistics.
+
+        Returns:
+            dict: entries, size, hits, misses and evictions.
+        """
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,284 @@
+"""MQTT 3.1.1 client on uasyncio streams, for retained display payloads."""
+
+from binascii import hexlify
+from os import urandom
+from struct import pack, unpack
+import uasyncio
+import utime
+from include.http_client import resolve
+
+# Control packet types (high nibble of the first byte)
+CONNECT = const(0x10)
+CONNACK = const(0x20)
+PUBLISH = const(0x30)
+SUBSCRIBE = const(0x82)  # with the reserved flags the spec requires
+SUBACK = const(0x90)
+PINGREQ = const(0xC0)
+PINGRESP = const(0xD0)
+DISCONNECT = const(0xE0)
+RETAIN = const(0x01)
+CONNACK_CODES = (
+    "accepted",
+    "unacceptable protocol version",
+    "identifier rejected",
+    "server unavailable",
+    "bad user name or password",
+    "not authorized",
+)
+
+
+def encode_string(text):
+    """Return a string as MQTT encodes it, length first."""
+    data = text.encode() if isinstance(text, str) else text
+    return pack(">H", len(data)) + data
+
+
+class MQTTClient(object):
+    """Connection to an MQTT broker.
+
+    Everything is sent and subscribed at QoS 0, so the broker sends
+    messages at QoS 0 too and nothing needs acknowledging.
+
+    Attributes:
+        connects: Number of connections made
+        messages: Number of messages received
+        skipped: Number of messages longer than max_bytes, dropped unread
+        pings: Number of keepalive pings sent
+    """
+
+    def __init__(
+        self,
+        host,
+        port=1883,
+        client_id=None,
+        user=None,
+        password=None,
+        keepalive=60,
+        timeout_ms=10000,
+        max_bytes=2048,
+        addr=None,
+    ):
+        """Constructor for the MQTT connection.
+
+        Args:
+            host (string): Broker host name or address.
+            port (int): Broker port.  Default is 1883.
+            client_id (string): Client identifier.  Default is solar-display-
+                and random hex digits.
+            user (string): User name, if the broker wants one.
+            password (string): Password, if the broker wants one.
+            keepalive (int): Seconds (at least 1) the broker waits for a
+                packet before dropping the client.  A ping is sent after half
+                of it idle.  Default is 60.
+            timeout_ms (int): Time allowed to connect, and for each reply
+                and packet once it has started.  Default is 10000.
+            max_bytes (int): Longest message payload to read.  Default is
+                2048.
+            addr (string): The broker's IP address, from resolve() before
+                the event loop started.  Without it a host name is looked up
+                here, which blocks.
+        """
+        self.host = host
+        self.port = port
+        self.addr = addr or resolve(host, port)
+        self.client_id = client_id or "solar-display-" + hexlify(urandom(4)).decode()
+        self.user = user
+        self.password = password
+        self.keepalive = keepalive
+        self.timeout_ms = timeout_ms
+        self.max_bytes = max_bytes
+        self.reader = None
+        self.writer = None
+        self.last_id = 0
+        self.last_sent = 0
+        self.pending = []  # messages that arrived before a SUBACK
+        self.connects = 0
+        self.messages = 0
+        self.skipped = 0
+        self.pings = 0
+
+    async def timed(self, awaitable, what):
+        """Await within timeout_ms."""
+        try:
+            return await uasyncio.wait_for_ms(awaitable, self.timeout_ms)
+        except uasyncio.TimeoutError:
+            raise OSError(f"MQTT {what} timed out after {self.timeout_ms} ms")
+
+    async def connect(self):
+        """Open the connection and log in, starting a clean session."""
+        self.pending = []
+        self.reader, self.writer = await self.timed(
+            uasyncio.open_connection(self.addr, self.port), "connect"
+        )
+        flags = 0x02  # clean session
+        payload = encode_string(self.client_id)
+        if self.user is not None:
+            flags |= 0x80
+            payload += encode_string(self.user)
+            if self.password is not None:
+                flags |= 0x40
+                payload += encode_string(self.password)
+        await self.send_packet(
+            CONNECT,
+            encode_string("MQTT") + pack(">BBH", 4, flags, self.keepalive) + payload,
+        )
+        packet_type, body = await self.receive()
+        if packet_type != CONNACK or len(body) != 2:
+            raise OSError("MQTT broker did not acknowledge the connection")
+        if body[1]:
+            code = body[1]
+            reason = CONNACK_CODES[code] if code < len(CONNACK_CODES) else code
+            raise OSError(f"MQTT connection refused: {reason}")
+        self.connects += 1
+
+    async def close(self):
+        """Disconnect, if connected."""
+        writer = self.writer
+        if writer is not None:
+            try:
+                writer.write(pack(">BB", DISCONNECT, 0))
+                await self.timed(writer.drain(), "disconnect")
+            except OSError:
+                pass
+            self.reader = self.writer = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def send_packet(self, first, body):
+        """Send a control packet, its remaining length encoded in front."""
+        head = bytearray((first,))
+        n = len(body)
+        while True:
+            digit = n & 0x7F
+            n >>= 7
+            head.append(digit | 0x80 if n else digit)
+            if not n:
+                break
+        self.writer.write(head + body)
+        await self.timed(self.writer.drain(), "send")
+        self.last_sent = utime.ticks_ms()
+
+    async def receive(self, wait_ms=None):
+        """Return the next packet's first byte and body.
+
+        A body longer than max_bytes is read and dropped, and returned as
+        None.
+
+        Args:
+            wait_ms (int): Time to wait for it to start (default
+                timeout_ms).
+        Raises:
+            uasyncio.TimeoutError: No packet started within wait_ms.
+        """
+        first = await uasyncio.wait_for_ms(
+            self.reader.readexactly(1), wait_ms or self.timeout_ms
+        )
+        length = 0
+        shift = 0
+        while True:
+            digit = (await self.timed(self.reader.readexactly(1), "packet"))[0]
+            length |= (digit & 0x7F) << shift
+            shift += 7
+            if not digit & 0x80:
+                break
+            if shift > 21:
+                raise OSError("MQTT packet length is malformed")
+        if length > self.max_bytes + 256:  # room for the topic
+            while length:
+                data = await self.timed(self.reader.read(min(length, 256)), "packet")
+                if not data:
+                    raise OSError("MQTT connection closed part way through a packet")
+                length -= len(data)
+            return first[0], None
+        body = await self.timed(self.reader.readexactly(length), "packet")
+        return first[0], body
+
+    async def publish(self, topic, payload, retain=False):
+        """Publish a message at QoS 0.
+
+        Args:
+            topic (string): Topic to publish on.
+            payload (bytes): Message, eg. JSON text.
+            retain (bool): Have the broker keep it for new subscribers.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        await self.send_packet(
+            PUBLISH | (RETAIN if retain else 0), encode_string(topic) + payload
+        )
+
+    async def subscribe(self, topic):
+        """Subscribe to a topic at QoS 0.
+
+        Retained messages on it are sent by the broker straight away, and
+        are passed on by listen().
+        """
+        self.last_id = self.last_id % 0xFFFF + 1
+        await self.send_packet(
+            SUBSCRIBE, pack(">H", self.last_id) + encode_string(topic) + b"\x00"
+        )
+        while True:
+            packet_type, body = await self.receive()
+            if packet_type & 0xF0 == PUBLISH:
+                # A retained message may overtake the acknowledgement
+                self.pending.append(body)
+                continue
+            if packet_type == SUBACK and body[:2] == pack(">H", self.last_id):
+                if body[2:3] == b"\x80":
+                    raise OSError(f"MQTT subscription to {topic} refused")
+                return
+
+    async def listen(self, on_message):
+        """Pass on messages from subscribed topics, keeping the connection up.
+
+        Args:
+            on_message (function): Called with the topic and payload (both
+                bytes) of each message.
+        Note:
+            Only returns by raising, when the connection drops or the
+            broker stops answering pings.
+        """
+        while self.pending:
+            self.dispatch(self.pending.pop(0), on_message)
+        pinged = False
+        while True:
+            idle = utime.ticks_diff(utime.ticks_ms(), self.last_sent)
+            wait = self.timeout_ms if pinged else self.keepalive * 500 - idle
+            try:
+                packet_type, body = await self.receive(max(wait, 1))
+            except uasyncio.TimeoutError:
+                if pinged:
+                    raise OSError("MQTT broker stopped answering pings")
+                await self.send_packet(PINGREQ, b"")
+                self.pings += 1
+                pinged = True
+                continue
+            if packet_type == PINGRESP:
+                pinged = False
+            elif packet_type & 0xF0 == PUBLISH:
+                self.dispatch(body, on_message)
+
+    def dispatch(self, body, on_message):
+        """Pass on the message in a PUBLISH packet's body."""
+        if body is None:
+            self.skipped += 1
+            return
+        n = unpack(">H", body[:2])[0] + 2
+        self.messages += 1
+        on_message(body[2:n], body[n:])
+
+    def stats(self):
+        """Return connection statistics.
+
+        Returns:
+            dict: connects, messages, skipped and pings.
+        """
+        return {
+            "connects": self.connects,
+            "messages": self.messages,
+            "skipped": self.skipped,
+            "pings": self.pings,
+        }
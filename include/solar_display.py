@@ -5,97 +5,301 @@ import gc
 
 # import sys
 from machine import Pin, SPI
-from math import sin, cos, pi
+from math import sqrt, ceil
 
 # sys.path.append("/include")
 # external things
 from include.ili9341 import Display, color565
-from include.xglcd_font import XglcdFont
-
-# load the fonts
-font = XglcdFont("fonts/FuturaNum21x39.c", 21, 39, 46)
-font_uom = XglcdFont("fonts/Calibri12x14.c", 12, 14, 87)
-font_num = XglcdFont("fonts/FuturaNum17x21.c", 17, 21, 46)
-font_icon = XglcdFont("fonts/Emoji24x24.c", 24, 24, 49)
+from include.xglcd_font import BinFont
+from include.lru import LRUCache
+from include.trig import icos, isin, steps
+
+# load the fonts (converted from the .c files with utils/xglcd2bin.py, read
+# a letter at a time; the argument is the byte budget for rendered letters,
+# enough for the distinct letter and colour pairs of the busiest frame, eg.
+# 23 of about 1.3 KB for font; utils/bench_render.py shows the hit rates)
+font = BinFont("fonts/FuturaNum21x39.bin", cache_bytes=32768)
+font_uom = BinFont("fonts/Calibri12x14.bin", cache_bytes=4096)
+font_num = BinFont("fonts/FuturaNum17x21.bin", cache_bytes=6144)
+font_icon = BinFont("fonts/Emoji24x24.bin", cache_bytes=8192)
 
 bin_scale = 0.1
 
 
-# Arc drawing nicked from here https://www.scattergood.io/arc-drawing-algorithm/
-def draw_arc(display, x, y, r1, r2, per, colour):
-    gc.collect()
+# Gauge arcs are annulus sectors sweeping clockwise from 90 degrees
+# (straight down) through 180 to 270 (straight up), i.e. the left half.
+# Originally stamped with rotated squares, see
+# https://www.scattergood.io/arc-drawing-algorithm/
+# Spans are cached per (r1, r2, start, end) in whole degrees of sweep as
+# (x, y, w, h) rectangles relative to the centre, with identical
+# consecutive rows merged.
+arc_cache = LRUCache(max_items=12)
+
+
+def arc_degrees(per):
     if per >= 100:
-        fraction = 1.0
-    else:
-        fraction = per / 100
-    start_angle = pi / 2
-    xs = x  # cos(0) = 1
-    ys = y + r1  # sin(0) = 0
-
-    #    display.draw_line(xs1,ys1,xs2,ys2,colour)
-
-    max_angle = start_angle + (fraction * pi)  # end at 270 degrees
-    each_angle = start_angle  # start at 90 degress
-    step = pi / 90
-    while each_angle < max_angle:
-        display.fill_polygon(
-            4,
-            int(xs + (r1 * cos(each_angle))),
-            int(ys + (r1 * sin(each_angle))),
-            r2,
-            colour,
-            45 + int(each_angle / pi * 180),
-        )
-        each_angle += step
+        return 180
+    return max(int(per * 1.8), 0)
+
+
+def arc_spans(r1, r2, end, start=0):
+    # Ring of radius r1 and half-thickness r2, the old stamp radius.
+    # A pixel (x, y) is on or before sweep angle a while dx*y - dy*x <= 0
+    # for (dx, dy) pointing at a, so sectors sharing an edge never overlap.
+    # (dx, dy) are fixed point, so the tests are exact integer divisions.
+    key = (r1, r2, start, end)
+    spans = arc_cache.get(key)
+    if spans is not None:
+        return spans
+    spans = []
+    if end > start:
+        r_in = r1 - r2
+        r_out = r1 + r2
+        r_in2 = r_in * r_in
+        r_out2 = r_out * r_out
+        ex = icos(steps(90 + end))
+        ey = isin(steps(90 + end))
+        sx = icos(steps(90 + start))
+        sy = isin(steps(90 + start))
+        run = None
+        for y in range(-int(r_out), int(r_out) + 1):
+            yy = y * y
+            x0 = -int(sqrt(r_out2 - yy))
+            x1 = -int(ceil(sqrt(r_in2 - yy))) if yy < r_in2 else 0
+            # Keep pixels on or before the end angle...
+            if ey > 0:
+                x0 = max(x0, -(-ex * y // ey))
+            elif ey < 0:
+                x1 = min(x1, ex * y // ey)
+            elif ex * y > 0:
+                x1 = x0 - 1  # half way round, lower half only
+            # ...and drop those on or before the start angle
+            if start == 0:
+                pass
+            elif sy > 0:
+                x1 = min(x1, -(-sx * y // sy) - 1)
+            elif sy < 0:
+                x0 = max(x0, sx * y // sy + 1)
+            elif sx * y <= 0:
+                x1 = x0 - 1  # half way round, upper half only
+            if x0 > x1:
+                run = None
+                continue
+            if run and run[0] == x0 and run[2] == x1 - x0 + 1:
+                run[3] += 1
+            else:
+                run = [x0, y, x1 - x0 + 1, 1]
+                spans.append(run)
+        spans = [tuple(run) for run in spans]
+    return arc_cache.put(key, spans, len(spans))
+
+
+def draw_arc(display, x, y, r1, r2, per, colour):
+    # The arc is centred at (x, y + r1), starting at (x, y + 2 * r1)
+    cy = y + r1
+    for sx, sy, w, h in arc_spans(r1, r2, arc_degrees(per)):
+        display.fill_rectangle(x + sx, cy + sy, w, h, colour)
+
+
+class Gauge:
+    # An arc that remembers what it last drew, so a new value only costs
+    # the sector between the old and new angles
+    def __init__(self, r1, r2, colour, background=0):
+        self.r1 = r1
+        self.r2 = r2
+        self.colour = colour
+        self.background = background
+        self.origin = None
+        self.degrees = 0
+
+    def invalidate(self):
+        # Forget what's on screen (e.g. after a clear)
+        self.origin = None
+        self.degrees = 0
+
+    def sector(self, display, start, end, colour, clip=None):
+        x, y = self.origin
+        cy = y + self.r1
+        for sx, sy, w, h in arc_spans(self.r1, self.r2, end, start):
+            x0 = x + sx
+            y0 = cy + sy
+            if clip is None:
+                display.fill_rectangle(x0, y0, w, h, colour)
+                continue
+            for cx0, cy0, cx1, cy1 in clip:
+                ix0 = max(x0, cx0)
+                iy0 = max(y0, cy0)
+                ix1 = min(x0 + w - 1, cx1)
+                iy1 = min(y0 + h - 1, cy1)
+                if ix0 <= ix1 and iy0 <= iy1:
+                    display.fill_rectangle(
+                        ix0, iy0, ix1 - ix0 + 1, iy1 - iy0 + 1, colour
+                    )
+
+    def update(self, display, x, y, per):
+        degrees = arc_degrees(per)
+        if self.origin != (x, y):
+            if self.origin:  # moved - erase the old arc
+                self.sector(display, 0, self.degrees, self.background)
+            self.origin = (x, y)
+            self.sector(display, 0, degrees, self.colour)
+        elif degrees > self.degrees:
+            self.sector(display, self.degrees, degrees, self.colour)
+        elif degrees < self.degrees:
+            self.sector(display, degrees, self.degrees, self.background)
+        self.degrees = degrees
+
+    def repaint(self, display, clip):
+        # Redraw the current arc, but only where clip rectangles were damaged
+        if self.origin:
+            self.sector(display, 0, self.degrees, self.colour, clip)
+
+    def rects(self):
+        # Absolute rectangles currently covered by the arc
+        if not self.origin:
+            return []
+        x, y = self.origin
+        cy = y + self.r1
+        return [
+            (x + sx, cy + sy, x + sx + w - 1, cy + sy + h - 1)
+            for sx, sy, w, h in arc_spans(self.r1, self.r2, self.degrees)
+        ]
 
 
 def centre_text(y, text, max_text):
     return y - (max_text - len(text)) * 10
 
 
+def overlaps(rects, others):
+    for x0, y0, x1, y1 in rects:
+        for ox0, oy0, ox1, oy1 in others:
+            if x0 <= ox1 and ox0 <= x1 and y0 <= oy1 and oy0 <= y1:
+                return True
+    return False
+
+
+# Sections in drawing order, with the solar_usage fields each one reads.
+# Gauges are sections of their own so they can be updated incrementally.
+SECTIONS = (
+    ("solar_in", ("solar_in",)),
+    ("solar_in_gauge", ("solar_in",)),
+    ("solar_today", ("solar_today",)),
+    ("solar_today_gauge", ("solar_today",)),
+    ("power_used", ("power_used",)),
+    ("export_today", ("export_today", "bins")),
+    ("export_today_gauge", ("export_today", "bins")),
+    ("grid_in", ("grid_in",)),
+    ("grid_in_today", ("grid_in_today", "bins")),
+    ("grid_in_today_gauge", ("grid_in_today", "bins")),
+    ("timestamp", ("timestamp",)),
+    (
+        "battery",
+        ("battery_per", "prev_battery_int", "solis_discharging", "solis_charging"),
+    ),
+    ("presence", ("presence",)),
+    ("cur_rate", ("cur_rate", "power_up")),
+    ("bins", ("bins",)),
+)
+
+
 class SolarDisplay:
-    def __init__(self):
+    def __init__(self, shadow=None):
         # Define the display doings
+        # shadow: True or a list of (x, y, w, h) tiles to buffer in RAM
         spi1 = SPI(1, baudrate=40000000, sck=Pin(14), mosi=Pin(13))
-        display = Display(spi1, dc=Pin(2), cs=Pin(15), rst=Pin(0), rotation=270)
+        display = Display(
+            spi1, dc=Pin(2), cs=Pin(15), rst=Pin(0), rotation=270, shadow=shadow
+        )
         self.display = display
+        # section name -> (inputs last rendered, rectangles covered)
+        self.rendered = {}
+        self.gauges = {
+            "solar_in_gauge": Gauge(30, 5, color565(64, 0, 0)),
+            "solar_today_gauge": Gauge(30, 5, color565(64, 0, 0)),
+            "export_today_gauge": Gauge(33, 5, color565(64, 0, 0)),
+            "grid_in_today_gauge": Gauge(32, 6, color565(64, 0, 0)),
+        }
 
     # Main function to do all the displaying
-    def solar_data(self, solar_usage):
-        self.display.clear()
-        self.solar_in(solar_usage)
-        self.solar_today(solar_usage)
-        self.power_used(solar_usage)
-        self.export_today(solar_usage)
-        self.grid_in(solar_usage)
-        self.grid_in_today(solar_usage)
-        self.timestamp(solar_usage)
-        self.battery(solar_usage)
-        self.presence(solar_usage)
-        self.cur_rate(solar_usage)
-        if solar_usage.get("bins"):
-            self.bins(solar_usage)
+    # Only sections whose inputs changed are erased and redrawn, along with
+    # any other section their old or new pixels overlap.  Gauges are never
+    # erased: they draw the difference, or repaint just the damaged area.
+    def solar_data(self, solar_usage, sections=None):
+        names = sections or [name for name, fields in SECTIONS]
+        rendered = self.rendered
+        changed = {}
+        damage = []
+        for name, fields in SECTIONS:
+            if name not in names:
+                continue
+            key = tuple(solar_usage.get(field) for field in fields)
+            prev = rendered.get(name)
+            if prev and prev[0] == key:
+                continue
+            changed[name] = key
+            gauge = self.gauges.get(name)
+            # Gauges follow their value (the first field) incrementally, but
+            # a layout change means erasing them like any other section
+            if prev and (not gauge or prev[0][1:] != key[1:]):
+                if gauge:
+                    gauge.invalidate()
+                for x0, y0, x1, y1 in prev[1]:
+                    self.display.fill_rectangle(
+                        x0, y0, x1 - x0 + 1, y1 - y0 + 1, color565(0, 0, 0)
+                    )
+                damage.extend(prev[1])
+        for name, fields in SECTIONS:
+            gauge = self.gauges.get(name)
+            self.display.track_bounds()
+            if name in changed:
+                key = changed[name]
+                if gauge and overlaps(gauge.rects(), damage):
+                    gauge.repaint(self.display, damage)
+            elif name in rendered and overlaps(rendered[name][1], damage):
+                if gauge:
+                    gauge.repaint(self.display, damage)
+                    damage.extend(self.display.tracked_bounds())
+                    continue
+                key = rendered[name][0]
+            else:
+                self.display.tracked_bounds()
+                continue
+            # Sections only read their own fields, so the key redraws them
+            getattr(self, name)(dict(zip(fields, key)))
+            rects = self.display.tracked_bounds()
+            rendered[name] = (key, gauge.rects() if gauge else rects)
+            damage.extend(rects)
+        self.display.flush()
 
     def ip_address(self, ip):
         self.display.draw_text(
             80, 310, ip, font, color565(224, 224, 224), landscape=True
         )
+        self.display.flush()
 
     def clear(self):
+        self.rendered = {}
+        for gauge in self.gauges.values():
+            gauge.invalidate()
         self.display.clear()
+        self.display.flush()
         gc.collect()
 
     def status_checking(self):
         self.display.fill_rectangle(238, 0, 2, 2, color565(192, 64, 64))  # checking
+        self.display.flush()
 
     def status_ok(self):
         self.display.fill_rectangle(238, 0, 2, 2, color565(0, 0, 0))  # done
+        self.display.flush()
 
     def status_invalid_data(self):
         self.display.fill_rectangle(238, 0, 2, 2, color565(0, 192, 192))  # done
+        self.display.flush()
 
     def status_failed(self):
         self.display.fill_rectangle(238, 0, 2, 2, color565(0, 0, 192))  # failed
+        self.display.flush()
 
     def solar_in(self, solar_usage):
         ############
@@ -103,9 +307,7 @@ class SolarDisplay:
         ############
         root_x = 65
         root_y = 319
-        solar_in_max = 5000
         solar_in_val = solar_usage["solar_in"]
-        solar_in_per = int(solar_in_val / solar_in_max * 100)
 
         if solar_in_val > 1000:
             solar_in_str = str(solar_in_val / 1000)[:4]
@@ -161,14 +363,13 @@ class SolarDisplay:
                 landscape=True,
             )  # cloud
 
-        draw_arc(
-            self.display,
-            root_x - 17,
-            root_y - 69,
-            30,
-            5,
-            solar_in_per,
-            color565(64, 0, 0),
+    def solar_in_gauge(self, solar_usage):
+        root_x = 65
+        root_y = 319
+        solar_in_max = 5000
+        solar_in_per = int(solar_usage["solar_in"] / solar_in_max * 100)
+        self.gauges["solar_in_gauge"].update(
+            self.display, root_x - 17, root_y - 69, solar_in_per
         )
 
     def solar_today(self, solar_usage):
@@ -177,8 +378,6 @@ class SolarDisplay:
         ########################
         root_x = 180
         root_y = 319
-        solar_today_max = 30.0
-        solar_today_per = solar_usage["solar_today"] / solar_today_max * 100
         solar_today_str = f'{solar_usage["solar_today"]}'[:4]
         solar_today_uom = "kWhxtodey"
         self.display.draw_text(
@@ -209,14 +408,13 @@ class SolarDisplay:
             landscape=True,
         )  # sun
 
-        draw_arc(
-            self.display,
-            root_x - 15,
-            root_y - 69,
-            30,
-            5,
-            solar_today_per,
-            color565(64, 0, 0),
+    def solar_today_gauge(self, solar_usage):
+        root_x = 180
+        root_y = 319
+        solar_today_max = 30.0
+        solar_today_per = solar_usage["solar_today"] / solar_today_max * 100
+        self.gauges["solar_today_gauge"].update(
+            self.display, root_x - 15, root_y - 69, solar_today_per
         )
 
     def power_used(self, solar_usage):
@@ -273,13 +471,11 @@ class SolarDisplay:
         root_y = int(
             228 * (1 if solar_usage.get("bins") else 1 - bin_scale)
         )  # scale for bins
-        export_today_max = 25.0
         export_today_val = solar_usage["export_today"]
         # Prevent negative values
         if export_today_val < 0:
             export_today_val = 0
         export_today_str = f"{export_today_val}"[:4]
-        export_today_per = int(export_today_val / export_today_max * 100)
         export_today_uom = "kWhxtodey"
 
         self.display.draw_text(
@@ -319,14 +515,16 @@ class SolarDisplay:
             landscape=True,
         )  # zap
 
-        draw_arc(
-            self.display,
-            root_x - 15,
-            root_y - 69,
-            33,
-            5,
-            export_today_per,
-            color565(64, 0, 0),
+    def export_today_gauge(self, solar_usage):
+        root_x = 180
+        root_y = int(
+            228 * (1 if solar_usage.get("bins") else 1 - bin_scale)
+        )  # scale for bins
+        export_today_max = 25.0
+        # Negative values give an empty gauge
+        export_today_per = int(solar_usage["export_today"] / export_today_max * 100)
+        self.gauges["export_today_gauge"].update(
+            self.display, root_x - 15, root_y - 69, export_today_per
         )
 
     def grid_in(self, solar_usage):
@@ -407,13 +605,11 @@ class SolarDisplay:
         root_y = int(
             138 * (1 if solar_usage.get("bins") else 1 - (bin_scale * 3))
         )  # scale for no bin icon
-        grid_in_today_max = 40.0
         grid_in_today_val = solar_usage["grid_in_today"]
         # Prevent negative values
         if grid_in_today_val < 0:
             grid_in_today_val = 0
         grid_in_today_str = f"{grid_in_today_val}"[:4]
-        grid_in_today_per = int(grid_in_today_val / grid_in_today_max * 100)
         grid_in_today_uom = "kWhxtodey"
 
         self.display.draw_text(
@@ -453,14 +649,16 @@ class SolarDisplay:
             landscape=True,
         )  # zap
 
-        draw_arc(
-            self.display,
-            root_x - 15,
-            root_y - 69,
-            32,
-            6,
-            grid_in_today_per,
-            color565(64, 0, 0),
+    def grid_in_today_gauge(self, solar_usage):
+        root_x = 180
+        root_y = int(
+            138 * (1 if solar_usage.get("bins") else 1 - (bin_scale * 3))
+        )  # scale for no bin icon
+        grid_in_today_max = 40.0
+        # Negative values give an empty gauge
+        grid_in_today_per = int(solar_usage["grid_in_today"] / grid_in_today_max * 100)
+        self.gauges["grid_in_today_gauge"].update(
+            self.display, root_x - 15, root_y - 69, grid_in_today_per
         )
 
     def battery(self, solar_usage):
@@ -471,11 +669,10 @@ class SolarDisplay:
         root_y = 52
         battery_per_val = solar_usage["battery_per"]
         battery_per_str = f"{battery_per_val}".split(".")[0]
-        # note: % symbol is actually / in the font bytecode
         self.display.draw_text(
             root_x,
             root_y,
-            f"{battery_per_str}/",
+            f"{battery_per_str}%",
             font_num,
             color565(255, 230, 230),
             landscape=True,
@@ -530,33 +727,12 @@ class SolarDisplay:
         self.display.draw_text(
             root_x,
             root_y,
-            f"{solar_usage["timestamp"].split("T")[1][:5]}",
+            solar_usage["timestamp"].split("T")[1][:5],
             font_num,
             color565(64, 64, 64),
             landscape=True,
         )  # time
 
-    def rate_lookup(self, in_rate):
-        lookup = {
-            "0": "X",
-            "1": "Y",
-            "2": "Z",
-            "3": "[",
-            "4": "\\",
-            "5": "]",
-            "6": "^",
-            "7": "_",
-            "8": "`",
-            "9": "a",
-            ".": "b",
-            "-": "j",
-            "p": "p",
-        }
-        out_rate = ""
-        for char in in_rate:
-            out_rate += lookup.get(char)
-        return out_rate
-
     def cur_rate(self, solar_usage):
         #######################################
         # current agile rate - sent in pounds #
@@ -576,9 +752,9 @@ class SolarDisplay:
         if solar_usage["power_up"] == "on":
             rate_col = color565(192, 64, 192)
 
-        rate_str_raw = f"{rate:.2f}p"
-        rate_str = self.rate_lookup(rate_str_raw)
-        print(f"rate_str_raw ({rate_str_raw}) -> rate_str: {rate_str}")
+        # rate digits are remapped to the font's second set of numerals
+        rate_str = f"{rate:.2f}p"
+        print(f"rate_str: {rate_str}")
 
         self.display.draw_text(
             root_x, root_y, rate_str, font_uom, rate_col, landscape=True
@@ -618,18 +794,20 @@ class SolarDisplay:
         root_y = 17
         gc.collect()
         bins = solar_usage.get("bins")
+        if not bins:  # nothing to collect
+            return
         if len(bins) == 2:  # 2 chars per bin
             print(f"1 bins: {bins}")
-            self.display.draw_image(
-                f"images/wheelie-bin-{bins}-48x33.raw", root_x + 58, root_y, 48, 33
+            self.display.draw_rle_image(
+                f"images/wheelie-bin-{bins}-48x33.rle", root_x + 58, root_y
             )
         elif len(bins) == 4:  # only space for 2 bins
             print(f"2 bins: {bins}")
-            self.display.draw_image(
-                f"images/wheelie-bin-{bins[0:2]}-48x33.raw", root_x, root_y, 48, 33
+            self.display.draw_rle_image(
+                f"images/wheelie-bin-{bins[0:2]}-48x33.rle", root_x, root_y
             )
-            self.display.draw_image(
-                f"images/wheelie-bin-{bins[2:4]}-48x33.raw", root_x + 58, root_y, 48, 33
+            self.display.draw_rle_image(
+                f"images/wheelie-bin-{bins[2:4]}-48x33.rle", root_x + 58, root_y
             )
         else:
             print(f"Unsupported bin string (not 2 or 4 characters): {bins}")
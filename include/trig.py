@@ -0,0 +1,57 @@
+"""Fixed-point sine and cosine from a precomputed table."""
+
+from array import array
+from math import pi, sin
+
+SHIFT = 14
+ONE = 1 << SHIFT  # fixed-point 1.0
+STEPS = 720  # table steps per turn, i.e. half degrees
+QUARTER = STEPS // 4
+
+# Quarter wave (0 to 90 degrees inclusive); the rest follows by symmetry.
+# Built once at import so no floats are made afterwards.
+_SINE = array(
+    "h", (int(round(sin(pi / 2 * i / QUARTER) * ONE)) for i in range(QUARTER + 1))
+)
+
+
+def steps(degrees):
+    """Return the nearest table step for an angle.
+
+    Args:
+        degrees (int or float): Angle in degrees.
+    Returns:
+        int: Angle in table steps (STEPS per turn).
+    """
+    if isinstance(degrees, int):
+        return degrees * STEPS // 360
+    return int(round(degrees * STEPS / 360))
+
+
+def isin(step):
+    """Return sine of an angle in table steps, scaled by ONE.
+
+    Args:
+        step (int): Angle in table steps (any integer).
+    Returns:
+        int: sin(angle) * ONE, rounded.
+    """
+    step %= STEPS
+    if step <= QUARTER:
+        return _SINE[step]
+    if step <= 2 * QUARTER:
+        return _SINE[2 * QUARTER - step]
+    if step <= 3 * QUARTER:
+        return -_SINE[step - 2 * QUARTER]
+    return -_SINE[STEPS - step]
+
+
+def icos(step):
+    """Return cosine of an angle in table steps, scaled by ONE.
+
+    Args:
+        step (int): Angle in table steps (any integer).
+    Returns:
+        int: cos(angle) * ONE, rounded.
+    """
+    return isin(step + QUARTER)
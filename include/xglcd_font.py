@@ -1,5 +1,7 @@
 """XGLCD Font Utility."""
 from math import ceil, floor
+from struct import calcsize, unpack
+from include.lru import LRUCache
 
 
 class XglcdFont(object):
@@ -11,6 +13,7 @@ class XglcdFont(object):
         height: Pixel height of font
         start_letter: ASCII number of first letter
         height_bytes: How many bytes comprises letter height
+        cache: LRU cache of rendered letters (see LRUCache for hit counters)
 
     Note:
         Font files can be generated with the free version of MikroElektronika
@@ -22,8 +25,11 @@ class XglcdFont(object):
 
     # Dict to tranlate bitwise values to byte position
     BIT_POS = {1: 0, 2: 2, 4: 4, 8: 6, 16: 8, 32: 10, 64: 12, 128: 14, 256: 16}
+    # Byte value to byte positions of its lit bits, filled in on demand
+    BIT_OFFSETS = {}
 
-    def __init__(self, path, width, height, start_letter=32, letter_count=96):
+    def __init__(self, path, width, height, start_letter=32, letter_count=96,
+                 cache_bytes=2048):
         """Constructor for X-GLCD Font object.
 
         Args:
@@ -32,6 +38,8 @@ class XglcdFont(object):
             height (int): Height in pixels of each letter
             start_letter (int): First ACII letter.  Default is 32.
             letter_count (int): Total number of letters.  Default is 96.
+            cache_bytes (int): Budget for rendered letters.  Default is 2048.
+                0 disables the cache.
         """
         self.width = width
         self.height = max(height, 8)
@@ -39,6 +47,9 @@ class XglcdFont(object):
         self.letter_count = letter_count
         self.bytes_per_letter = (floor(
             (self.height - 1) / 8) + 1) * self.width + 1
+        self.cache = LRUCache(max_bytes=cache_bytes) if cache_bytes else None
+        # Landscape byte patterns for the last colour pair used
+        self.patterns = (None, None, {})
         self.__load_xglcd_font(path)
 
     def __load_xglcd_font(self, path):
@@ -70,6 +81,33 @@ class XglcdFont(object):
                     int(b, 16) for b in line.split(','))
                 offset += bytes_per_letter
 
+    def glyph(self, index):
+        """Return width and column byte data of the letter at an index.
+
+        Args:
+            index (int): Letter index within the font.
+        Returns:
+            (int, memoryview): Letter width and its column bytes.
+        """
+        offset = index * self.bytes_per_letter
+        mv = memoryview(self.letters)[offset:offset + self.bytes_per_letter]
+        # Width is the first byte; only columns within it hold any data
+        letter_width = mv[0]
+        return letter_width, mv[1:1 + letter_width * ceil(self.height / 8)]
+
+    def glyph_width(self, index):
+        """Return width of the letter at an index (0 if missing)."""
+        if index < 0:
+            return 0
+        return self.letters[index * self.bytes_per_letter]
+
+    def letter_index(self, letter):
+        """Return index of a letter within the font (-1 if missing)."""
+        index = ord(letter) - self.start_letter
+        if 0 <= index < self.letter_count:
+            return index
+        return -1
+
     def lit_bits(self, n):
         """Return positions of 1 bits only."""
         while n:
@@ -77,9 +115,56 @@ class XglcdFont(object):
             yield self.BIT_POS[b]
             n ^= b
 
+    def bit_offsets(self, b):
+        """Return byte positions of the 1 bits of a byte (cached)."""
+        offsets = self.BIT_OFFSETS.get(b)
+        if offsets is None:
+            offsets = tuple(self.lit_bits(b))
+            self.BIT_OFFSETS[b] = offsets
+        return offsets
+
+    def expand_byte(self, b, pixel, blank):
+        """Expand a byte to 8 RGB565 pixels, least significant bit first.
+
+        Args:
+            b (int): Font byte.
+            pixel (bytes): Big endian RGB565 value for 1 bits.
+            blank (bytes): Big endian RGB565 value for 0 bits.
+        Returns:
+            (bytes): 16 bytes of pixel data.
+        """
+        return b''.join(pixel if b >> i & 1 else blank for i in range(8))
+
     def get_letter(self, letter, color, background=0, landscape=False):
         """Convert letter byte data to pixels.
 
+        Args:
+            letter (string): Letter to return (must exist within font).
+            color (int): RGB565 color value.
+            background (int): RGB565 background color (default: black).
+            landscape (bool): Orientation (default: False = portrait)
+        Returns:
+            (bytearray): Pixel data.
+            (int, int): Letter width and height.
+        Note:
+            Rendered letters are cached and shared, so the returned buffer
+            must not be modified.
+        """
+        cache = self.cache
+        if cache is not None:
+            key = (letter, color, background, landscape)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            cached = self.render_letter(letter, color, background, landscape)
+            if cached[1]:
+                cache.put(key, cached, len(cached[0]))
+            return cached
+        return self.render_letter(letter, color, background, landscape)
+
+    def render_letter(self, letter, color, background=0, landscape=False):
+        """Render letter byte data to pixels, bypassing the cache.
+
         Args:
             letter (string): Letter to return (must exist within font).
             color (int): RGB565 color value.
@@ -90,17 +175,13 @@ class XglcdFont(object):
             (int, int): Letter width and height.
         """
         # Get index of letter
-        letter_ord = ord(letter) - self.start_letter
+        letter_ord = self.letter_index(letter)
         # Confirm font contains letter
-        if letter_ord >= self.letter_count:
+        if letter_ord < 0:
             print('Font does not contain character: ' + letter)
             return b'', 0, 0
-        bytes_per_letter = self.bytes_per_letter
-        offset = letter_ord * bytes_per_letter
-        mv = memoryview(self.letters[offset:offset + bytes_per_letter])
-
-        # Get width of letter (specified by first byte)
-        letter_width = mv[0]
+        # Get width of letter and its column byte data
+        letter_width, data = self.glyph(letter_ord)
         letter_height = self.height
         # Get size in bytes of specified letter
         letter_size = letter_height * letter_width
@@ -110,18 +191,30 @@ class XglcdFont(object):
         else:
             buf = bytearray(letter_size * 2)
 
-        msb, lsb = color.to_bytes(2, 'big')
+        pixel = color.to_bytes(2, 'big')
+        msb, lsb = pixel
 
         if landscape:
             # Populate buffer in order for landscape
             pos = (letter_size * 2) - (letter_height * 2)
             lh = letter_height
+            # A byte covers 8 consecutive pixels of a landscape row, so it
+            # is expanded once into a 16 byte pattern and copied as a slice
+            blank = background.to_bytes(2, 'big')
+            patterns = self.patterns
+            if patterns[0] != pixel or patterns[1] != blank:
+                patterns = self.patterns = (pixel, blank, {})
+            patterns = patterns[2]
             # Loop through letter byte data and convert to pixel data
-            for b in mv[1:]:
+            for b in data:
                 # Process only colored bits
-                for bit in self.lit_bits(b):
-                    buf[bit + pos] = msb
-                    buf[bit + pos + 1] = lsb
+                if b:
+                    pattern = patterns.get(b)
+                    if pattern is None:
+                        pattern = memoryview(self.expand_byte(b, pixel, blank))
+                        patterns[b] = pattern
+                    n = 16 if lh > 8 else lh * 2
+                    buf[pos:pos + n] = pattern[:n]
                 if lh > 8:
                     # Increment position by double byte
                     pos += 16
@@ -135,11 +228,12 @@ class XglcdFont(object):
             col = 0  # Set column to first column
             bytes_per_letter = ceil(letter_height / 8)
             letter_byte = 0
+            bit_offsets = self.bit_offsets
             # Loop through letter byte data and convert to pixel data
-            for b in mv[1:]:
+            for b in data:
                 # Process only colored bits
                 segment_size = letter_byte * letter_width * 16
-                for bit in self.lit_bits(b):
+                for bit in bit_offsets(b):
                     pos = (bit * letter_width) + (col * 2) + segment_size
                     buf[pos] = msb
                     pos = (bit * letter_width) + (col * 2) + 1 + segment_size
@@ -162,9 +256,111 @@ class XglcdFont(object):
         """
         length = 0
         for letter in text:
-            # Get index of letter
-            letter_ord = ord(letter) - self.start_letter
-            offset = letter_ord * self.bytes_per_letter
             # Add length of letter and spacing
-            length += self.letters[offset] + spacing
+            length += self.glyph_width(self.letter_index(letter)) + spacing
         return length
+
+
+class BinFont(XglcdFont):
+    """Font data in compact binary format, read from flash on demand.
+
+    Attributes:
+        path: Path of the font file
+        widths: Pixel width of each letter
+        offsets: File offset of each letter's column bytes
+        glyphs: LRU cache of column bytes read from the file
+        charmap: Character code to letter index (None when letters are
+            consecutive from start_letter)
+
+    Note:
+        Convert X-GLCD 'C' files with utils/xglcd2bin.py, or cut them down
+        to the letters the display uses with utils/font_subset.py.  The
+        layout is (little endian):
+            4s  magic b'XGF1'
+            B   maximum width
+            B   height
+            B   start letter
+            B   flags (FLAG_CHARMAP)
+            H   letter count
+            H   reserved (0)
+            B   width of each letter
+            B   character code of each letter (only with FLAG_CHARMAP)
+            column bytes of each letter, trimmed to its width, with
+            ceil(height / 8) bytes per column.
+    """
+
+    MAGIC = b'XGF1'
+    HEADER = '<4sBBBBHH'
+    # Letters are listed by character code rather than consecutive
+    FLAG_CHARMAP = 1
+
+    def __init__(self, path, cache_bytes=2048, glyph_bytes=1024):
+        """Constructor for binary font object.
+
+        Args:
+            path (string): Full path of font file
+            cache_bytes (int): Budget for rendered letters.  Default is 2048.
+                0 disables the cache.
+            glyph_bytes (int): Budget for column bytes read from the file.
+                Default is 1024.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(calcsize(self.HEADER))
+            (magic, width, height, start_letter, flags, letter_count,
+             reserved) = unpack(self.HEADER, header)
+            if magic != self.MAGIC:
+                raise ValueError('Not a binary font file: ' + path)
+            self.widths = f.read(letter_count)
+            if flags & self.FLAG_CHARMAP:
+                codes = f.read(letter_count)
+                self.charmap = {code: i for i, code in enumerate(codes)}
+            else:
+                self.charmap = None
+        self.width = width
+        self.height = max(height, 8)
+        self.start_letter = start_letter
+        self.letter_count = letter_count
+        self.column_bytes = floor((self.height - 1) / 8) + 1
+        self.bytes_per_letter = self.column_bytes * self.width + 1
+        # Letters are packed back to back after the width table
+        self.offsets = []
+        offset = len(header) + letter_count
+        if self.charmap is not None:
+            offset += letter_count
+        for letter_width in self.widths:
+            self.offsets.append(offset)
+            offset += letter_width * self.column_bytes
+        self.glyphs = LRUCache(max_bytes=glyph_bytes)
+        self.cache = LRUCache(max_bytes=cache_bytes) if cache_bytes else None
+        self.patterns = (None, None, {})
+
+    def glyph(self, index):
+        """Return width and column byte data of the letter at an index.
+
+        Args:
+            index (int): Letter index within the font.
+        Returns:
+            (int, memoryview): Letter width and its column bytes.
+        """
+        letter_width = self.widths[index]
+        data = self.glyphs.get(index)
+        if data is None:
+            size = letter_width * self.column_bytes
+            with open(self.path, 'rb') as f:
+                f.seek(self.offsets[index])
+                data = memoryview(f.read(size))
+            self.glyphs.put(index, data, size)
+        return letter_width, data
+
+    def glyph_width(self, index):
+        """Return width of the letter at an index (0 if missing)."""
+        if index < 0:
+            return 0
+        return self.widths[index]
+
+    def letter_index(self, letter):
+        """Return index of a letter within the font (-1 if missing)."""
+        if self.charmap is None:
+            return XglcdFont.letter_index(self, letter)
+        return self.charmap.get(ord(letter), -1)
@@ -2,8 +2,8 @@
 import sys
 import os
 import gc
+import json
 import uasyncio
-import urequests as requests
 from time import sleep
 import network
 from machine import Pin, reset
@@ -11,12 +11,17 @@ from machine import Pin, reset
 # Class that puts things on the screen
 from include.solar_display import SolarDisplay
 from include.ha_validation import validate_ha_data, filter_valid_data
+from include import http_client
+from include.ha_websocket import HAWebSocket
+from include.mqtt_client import MQTTClient
 
 # Global variables so it can be persistent
 solar_usage = {}
 # led_bright = 800
 CRED_FILE = const("config/credentials.env")
 SOLIS_FILE = const("config/solis.env")
+# Optional: broker,topic[,user,password] to take the data from MQTT instead
+MQTT_FILE = const("config/mqtt.env")
 
 clear_btn = Pin(0, Pin.IN, Pin.PULL_UP)
 bl_pin = Pin(21, Pin.OUT)
@@ -26,33 +31,44 @@ bl_pin = Pin(21, Pin.OUT)
 BL_NIGHT_START = const(23)  # 11pm
 BL_NIGHT_END = const(5)  # 4am
 
+# Take pushed updates over the Home Assistant WebSocket API between polls,
+# unless config/mqtt.env names a broker to take them from instead.
+# If the socket or broker drops, poll every 45 seconds PUSH_RETRY times
+# before trying it again.
+HA_PUSH = const(1)
+PUSH_RETRY = const(4)
+HA_ENTITY = const("input_text.solar_display_data")
+# Times to reconnect to the MQTT broker before polling Home Assistant instead
+MQTT_RETRY = const(3)
+
 display = SolarDisplay()
 
 bl_pin.on()
 gc.collect()
 
 
-def get_ha(ha_info):
+async def get_ha(ha_conn, ha_info):
     headers = {
         "Authorization": "Bearer " + ha_info["ha_token"].decode("utf-8"),
         "content-type": "application/json",
     }
     solar_dict = {}
-    ha_url = (
-        ha_info["ha_url"].decode("utf-8") + "/api/states/input_text.solar_display_data"
-    )
+    ha_path = "/api/states/" + HA_ENTITY
     print(f"Getting data...")
     try:
-        gc.collect()
-        resp = requests.get(url=ha_url, headers=headers, timeout=10)
-        solar_dict = resp.json()["attributes"]["info"]
-        resp.close()  # Explicitly close to free memory
+        # Other tasks (buttons, backlight) keep running while this waits,
+        # and the connection is kept open between polls.  Only the info
+        # attribute is kept from the response as it streams in.
+        resp = await ha_conn.get(
+            ha_path, headers=headers, extract=("attributes", "info")
+        )
+        solar_dict = resp.value
         del resp
-        gc.collect()
         print(f"Here's what I got: {solar_dict}")
     except Exception as e:
-        print(f" ... o no!\nI couldn't get the data from {ha_url}")
+        print(f" ... o no!\nI couldn't get the data from {ha_conn.netloc}{ha_path}")
         print(f"Exception: {e}")
+    print(f"Connection: {ha_conn.stats()}")
 
     return solar_dict
 
@@ -88,8 +104,10 @@ def display_data(solar_usage, force=False):
     if processed_solar_usage := process_ha_response(solar_usage):
         print("Valid data received..")
         if solar_usage["timestamp"] != solar_usage["prev_timestamp"] or force:
-            print("Timestamp changed - refreshing full display")
+            print("Timestamp changed - refreshing changed sections")
             gc.collect()
+            if force:  # forget what's on screen and repaint everything
+                display.clear()
             display.solar_data(processed_solar_usage)
             # Update the previous values if they're different
             if solar_usage["timestamp"] != solar_usage["prev_timestamp"]:
@@ -98,37 +116,135 @@ def display_data(solar_usage, force=False):
         else:
             # Just update the presence
             print("Timestamp hasn't changed - only updating presence")
-            display.presence(solar_usage)
+            display.solar_data(solar_usage, sections=("presence",))
 
     else:  # data not valid
         display.status_invalid_data()
 
 
-# Coroutine: get the solis data every 45 seconds
+def handle_ha_data(solar_dict):
+    global solar_usage
+    if solar_dict.get(
+        "timestamp", None
+    ):  # timestamp needs to be valid as well as present
+        display.status_ok()
+        solar_usage.update(solar_dict)
+        backlight_control(solar_usage["timestamp"])  # do stuff with the backlight
+        if bl_pin.value():  # Only worth displaying data if the backlight's on.
+            display_data(solar_usage)
+    else:
+        display.status_failed()
+        print("No or invalid data returned")
+        if "resp" in solar_dict:
+            solar_usage["resp"] = solar_dict["resp"]
+    # Force garbage collection after processing
+    gc.collect()
+
+
+# Show each change as Home Assistant pushes it, until the socket drops
+async def push_ha_data(ha_info):
+    ha_ws = HAWebSocket(
+        ha_info["ha_url"].decode("utf-8"),
+        ha_info["ha_token"].decode("utf-8"),
+        addr=ha_info["ha_addr"],
+    )
+    print(f"Listening for changes...")
+    try:
+        await ha_ws.connect()
+        await ha_ws.listen(
+            HA_ENTITY,
+            lambda info: handle_ha_data(info if isinstance(info, dict) else {}),
+        )
+    except Exception as e:
+        print(f"WebSocket stopped, back to polling: {e!r}")
+    finally:
+        await ha_ws.close()
+    print(f"WebSocket: {ha_ws.stats()}")
+
+
+# Show each message on the MQTT topic, reconnecting if the broker drops
+async def mqtt_ha_data(ha_info):
+    user = ha_info.get("mqtt_user")
+    password = ha_info.get("mqtt_password")
+    mqtt = MQTTClient(
+        ha_info["mqtt_host"],
+        ha_info["mqtt_port"],
+        user=user and user.decode("utf-8"),
+        password=password and password.decode("utf-8"),
+        addr=ha_info["mqtt_addr"],
+    )
+    topic = ha_info["mqtt_topic"].decode("utf-8")
+    retries = 0
+    while retries < MQTT_RETRY:
+        if retries:
+            await uasyncio.sleep(2**retries)
+        print(f"Subscribing to {topic}...")
+        try:
+            await mqtt.connect()
+            # The retained message gives the current data straight away
+            await mqtt.subscribe(topic)
+            retries = 0
+            await mqtt.listen(
+                lambda _, payload: handle_ha_data(process_mqtt_payload(payload))
+            )
+        except Exception as e:
+            print(f"MQTT stopped: {e!r}")
+            display.status_failed()
+            retries += 1
+        finally:
+            await mqtt.close()
+        gc.collect()
+    print(f"MQTT: {mqtt.stats()}, back to polling")
+
+
+def process_mqtt_payload(payload):
+    try:
+        info = json.loads(payload)
+    except ValueError:
+        print(f"Invalid JSON from MQTT: {payload[:40]}")
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+# Coroutine: get the solis data every 45 seconds, or as it changes
 async def timer_ha_data(ha_info):
     global solar_usage
     solar_usage["prev_battery_int"] = 0
     solar_usage["prev_timestamp"] = "0"
+    ha_conn = http_client.Connection(
+        ha_info["ha_url"].decode("utf-8"), addr=ha_info["ha_addr"]
+    )
+    use_mqtt = "mqtt_broker" in ha_info
+    mqtt_wait = 0  # polls before trying the MQTT broker again
+    push_wait = 0  # polls before trying the WebSocket again
     while True:
+        if use_mqtt and not mqtt_wait:
+            # Returns once the broker can't be reached
+            await ha_conn.close()
+            await mqtt_ha_data(ha_info)
+            mqtt_wait = PUSH_RETRY
         display.status_checking()
         await uasyncio.sleep(1)
+        try:
+            # Between polls, as the lookup blocks: once an hour, or after
+            # the address stopped answering
+            ha_conn.refresh()
+            ha_info["ha_addr"] = ha_conn.addr
+        except OSError as e:
+            print(f"Couldn't find {ha_conn.host}: {e!r}")
         gc.collect()
-        solar_dict = get_ha(ha_info)
-        if solar_dict.get(
-            "timestamp", None
-        ):  # timestamp needs to be valid as well as present
-            display.status_ok()
-            solar_usage.update(solar_dict)
-            backlight_control(solar_usage["timestamp"])  # do stuff with the backlight
-            if bl_pin.value():  # Only worth displaying data if the backlight's on.
-                display_data(solar_usage)
-        else:
-            display.status_failed()
-            print("No or invalid data returned")
-            if "resp" in solar_dict:
-                solar_usage["resp"] = solar_dict["resp"]
-        # Force garbage collection after processing
-        gc.collect()
+        handle_ha_data(await get_ha(ha_conn, ha_info))
+        if use_mqtt:
+            if mqtt_wait:
+                mqtt_wait -= 1
+        elif HA_PUSH and ha_info["ha_addr"]:
+            if not push_wait:
+                # The poll gave the current state, changes are pushed from now
+                await ha_conn.close()
+                await push_ha_data(ha_info)
+                push_wait = PUSH_RETRY
+                continue  # catch up on anything missed straight away
+            push_wait -= 1
         await uasyncio.sleep(45)
 
 
@@ -193,6 +309,15 @@ def setup():
     except OSError:
         print("No or invalid credentials file - please do a full reset and start again")
         sys.exit()
+    try:
+        with open(MQTT_FILE, "rb") as f:
+            contents = f.read().strip().split(b",")
+            if len(contents) in (2, 4):
+                ha_info["mqtt_broker"], ha_info["mqtt_topic"] = contents[:2]
+            if len(contents) == 4:
+                ha_info["mqtt_user"], ha_info["mqtt_password"] = contents[2:]
+    except OSError:
+        pass  # no broker, get the data from Home Assistant
     # Define the URL list
 
     ha_api = {
@@ -228,6 +353,25 @@ def setup():
     print("\nWifi connected - IP address is: " + ip_address)
     display.ip_address(ip_address)
 
+    # Look the hosts up now: getaddrinfo() blocks, and would stall the
+    # display if it ran in the event loop.  IP addresses need no lookup.
+    _, host, port, _ = http_client.parse_url(ha_info["ha_url"].decode("utf-8"))
+    try:
+        ha_info["ha_addr"] = http_client.resolve(host, port)
+    except OSError:
+        # The poll timer looks it up again until it's found
+        print(f"Couldn't find {host} yet - please check the Home Assistant URL")
+        ha_info["ha_addr"] = None
+        display.status_failed()
+    if "mqtt_broker" in ha_info:
+        host, _, port = ha_info["mqtt_broker"].decode("utf-8").partition(":")
+        ha_info["mqtt_host"], ha_info["mqtt_port"] = host, int(port or 1883)
+        try:
+            ha_info["mqtt_addr"] = http_client.resolve(host, ha_info["mqtt_port"])
+        except OSError:
+            print(f"Couldn't find the MQTT broker {host} - using Home Assistant")
+            del ha_info["mqtt_broker"]
+
     sleep(1)
     # clear down all the doings
     del sys.modules["captive_portal"]
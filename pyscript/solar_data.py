@@ -1,5 +1,8 @@
 import json
 
+# Displays set up with config/mqtt.env subscribe to this (retained) topic
+MQTT_TOPIC = "solar_display/info"
+
 
 @service
 def get_solar_data():
@@ -19,3 +22,5 @@ def get_solar_data():
         "Last updated"
     ]
     state.set("input_text.solar_display_data", value=states["timestamp"], info=states)
+    if service.has_service("mqtt", "publish"):
+        mqtt.publish(topic=MQTT_TOPIC, payload=json.dumps(states), retain=True)
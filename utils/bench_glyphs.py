@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Benchmark glyph rendering in XglcdFont on CPython.
+
+Times every glyph of the project fonts through the original bit-by-bit
+renderer and through XglcdFont.render_letter(), in both orientations, and
+checks that the two produce identical pixels.
+Usage:
+    python utils/bench_glyphs.py [repeats]
+    repeats is the number of passes over each font (default 20).
+"""
+
+from math import ceil
+from os import path
+from time import perf_counter
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from include.xglcd_font import XglcdFont  # noqa: E402
+
+# Same arguments as include/solar_display.py
+FONTS = (
+    ("fonts/FuturaNum21x39.c", 21, 39, 46),
+    ("fonts/Calibri12x14.c", 12, 14, 87),
+    ("fonts/FuturaNum17x21.c", 17, 21, 46),
+    ("fonts/Emoji24x24.c", 24, 24, 49),
+)
+COLOR = 0xC7FF
+BACKGROUND = 0x0841
+
+
+def legacy_letter(font, letter, color, background=0, landscape=False):
+    """Render a letter the way XglcdFont did before the expansion tables."""
+    letter_ord = ord(letter) - font.start_letter
+    offset = letter_ord * font.bytes_per_letter
+    mv = memoryview(font.letters[offset : offset + font.bytes_per_letter])
+    letter_width = mv[0]
+    letter_height = font.height
+    letter_size = letter_height * letter_width
+    if background:
+        buf = bytearray(background.to_bytes(2, "big") * letter_size)
+    else:
+        buf = bytearray(letter_size * 2)
+    msb, lsb = color.to_bytes(2, "big")
+    if landscape:
+        pos = (letter_size * 2) - (letter_height * 2)
+        lh = letter_height
+        for b in mv[1:]:
+            for bit in font.lit_bits(b):
+                buf[bit + pos] = msb
+                buf[bit + pos + 1] = lsb
+            if lh > 8:
+                pos += 16
+                lh -= 8
+            else:
+                pos -= (letter_height * 4) - (lh * 2)
+                lh = letter_height
+    else:
+        col = 0
+        bytes_per_col = ceil(letter_height / 8)
+        letter_byte = 0
+        for b in mv[1:]:
+            segment_size = letter_byte * letter_width * 16
+            for bit in font.lit_bits(b):
+                pos = (bit * letter_width) + (col * 2) + segment_size
+                buf[pos] = msb
+                buf[pos + 1] = lsb
+            letter_byte += 1
+            if letter_byte + 1 > bytes_per_col:
+                col += 1
+                letter_byte = 0
+    return buf, letter_width, letter_height
+
+
+def time_per_glyph(render, font, letters, landscape, repeats):
+    """Return mean microseconds per glyph."""
+    start = perf_counter()
+    for _ in range(repeats):
+        for letter in letters:
+            render(font, letter, COLOR, BACKGROUND, landscape)
+    return (perf_counter() - start) * 1e6 / (repeats * len(letters))
+
+
+def new_letter(font, letter, color, background, landscape):
+    return font.render_letter(letter, color, background, landscape)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(
+        "{:<24} {:<9} {:>10} {:>10} {:>7}".format(
+            "font", "layout", "before us", "after us", "speedup"
+        )
+    )
+    for font_path, width, height, start in FONTS:
+        font = XglcdFont(
+            path.join(ROOT, font_path), width, height, start, cache_bytes=0
+        )
+        # Only letters present in the file (later slots are empty)
+        letters = [
+            chr(start + i)
+            for i in range(font.letter_count)
+            if font.letters[i * font.bytes_per_letter]
+        ]
+        for landscape in (False, True):
+            for letter in letters:
+                if legacy_letter(
+                    font, letter, COLOR, BACKGROUND, landscape
+                ) != new_letter(font, letter, COLOR, BACKGROUND, landscape):
+                    print("Mismatch: {} {!r}".format(font_path, letter))
+                    sys.exit(-1)
+            before = time_per_glyph(legacy_letter, font, letters, landscape, repeats)
+            after = time_per_glyph(new_letter, font, letters, landscape, repeats)
+            print(
+                "{:<24} {:<9} {:>10.1f} {:>10.1f} {:>6.1f}x".format(
+                    path.basename(font_path),
+                    "landscape" if landscape else "portrait",
+                    before,
+                    after,
+                    before / after,
+                )
+            )
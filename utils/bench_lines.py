@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Benchmark Display.draw_line() at a range of slopes on CPython.
+
+Draws lines from the centre of the screen at angles from 0 to 90 degrees
+with the original pixel-per-step rasterizer and with draw_line(), checks
+that both light the same pixels, and compares the SPI transactions each
+one sends in the host simulator.
+Usage:
+    python utils/bench_lines.py [length]
+    length is the line length in pixels (default 100).
+"""
+
+from math import cos, radians, sin
+from os import path
+import sys
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import sim  # noqa: E402
+
+ANGLES = (0, 1, 5, 10, 20, 30, 45, 60, 70, 80, 85, 89, 90)
+COLOR = 0xFFE0
+
+
+def legacy_line(display, x1, y1, x2, y2, color):
+    """Draw a diagonal line a pixel at a time, as draw_line() did."""
+    is_steep = abs(y2 - y1) > abs(x2 - x1)
+    if is_steep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+    if x1 > x2:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+    dx = x2 - x1
+    dy = y2 - y1
+    error = dx >> 1
+    ystep = 1 if y1 < y2 else -1
+    y = y1
+    for x in range(x1, x2 + 1):
+        if not is_steep:
+            display.draw_pixel(x, y, color)
+        else:
+            display.draw_pixel(y, x, color)
+        error -= abs(dy)
+        if error < 0:
+            y += ystep
+            error += dx
+
+
+def measure(display, panel, draw, coords):
+    """Return transactions sent and the framebuffer after drawing."""
+    display.clear()
+    panel.reset_counters()
+    draw(display, *coords, COLOR)
+    return panel.transactions, bytes(panel.fb)
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    board = sim.install()
+    from machine import Pin, SPI  # noqa: E402
+    from include.ili9341 import Display  # noqa: E402
+
+    display = Display(SPI(1), dc=Pin(2), cs=Pin(15), rst=Pin(0))
+    x0, y0 = display.width // 2, display.height // 2
+    print("{:>6} {:>8} {:>8} {:>8}".format("angle", "before", "after", "saving"))
+    for angle in ANGLES:
+        coords = (
+            x0,
+            y0,
+            x0 + round(length * cos(radians(angle))),
+            y0 - round(length * sin(radians(angle))),
+        )
+        if angle in (0, 90):
+            # Axis lines were always one block
+            before, before_fb = measure(display, board.panel, Display.draw_line, coords)
+        else:
+            before, before_fb = measure(display, board.panel, legacy_line, coords)
+        after, after_fb = measure(display, board.panel, Display.draw_line, coords)
+        if before_fb != after_fb:
+            print("Mismatch at {} degrees".format(angle))
+            sys.exit(-1)
+        print(
+            "{:>6} {:>8} {:>8} {:>7.1f}x".format(angle, before, after, before / after)
+        )
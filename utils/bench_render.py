@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Benchmark display rendering on CPython with the simulator.
+
+Runs a fixed set of scenarios, from whole SolarDisplay updates down to
+single Display primitives, and reports for each the CPU time, the number
+of block() calls, SPI transactions, and command and pixel bytes sent to
+the panel, followed by the hit rate of each font's glyph cache over the
+whole run.  Results are checked against a stored baseline: byte and call
+counts are deterministic and must not grow, and CPU time must stay within
+TIME_TOLERANCE of the baseline.
+Usage:
+    python utils/bench_render.py [--update] [repeats]
+    --update saves the results as the new baseline (utils/bench_render.json)
+    repeats is the number of timed runs per scenario (default 5).
+"""
+
+from os import chdir, path
+from time import process_time
+import contextlib
+import io
+import json
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+BASELINE = path.join(ROOT, "utils", "bench_render.json")
+# CPU time may vary this much (plus TIME_SLACK ms) before it is a regression
+TIME_TOLERANCE = 2.0
+TIME_SLACK = 1.0
+COUNTS = ("blocks", "transactions", "command_bytes", "pixel_bytes")
+
+# Processed Home Assistant data, as main.display_data() passes it on
+DAY = {
+    "solar_in": 4321.0,
+    "solar_today": 23.4,
+    "power_used": 2345.0,
+    "export_today": 12.3,
+    "grid_in": -1234.0,
+    "grid_in_today": 33.3,
+    "battery_per": 55.0,
+    "prev_battery_int": 50,
+    "solis_discharging": "on",
+    "solis_charging": "off",
+    "presence": "jBC",
+    "cur_rate": 0.1234,
+    "power_up": "off",
+    "timestamp": "2024-01-01T12:34:56",
+    "bins": "bkbr",
+}
+# The next poll: most values move, bins and presence change
+EVENING = dict(
+    DAY,
+    solar_in=812.0,
+    solar_today=24.1,
+    power_used=1432.0,
+    grid_in=0.0,
+    battery_per=56.0,
+    prev_battery_int=55,
+    presence="jL",
+    timestamp="2024-01-01T12:35:56",
+    bins=None,
+    power_up="on",
+)
+
+
+def cold(sd):
+    sd.clear()
+
+
+def warm(sd):
+    sd.clear()
+    sd.solar_data(DAY)
+
+
+def nothing(sd):
+    pass
+
+
+# Name, set up (not measured), scenario
+SCENARIOS = (
+    ("solar_data first frame", cold, lambda sd: sd.solar_data(DAY)),
+    ("solar_data unchanged", warm, lambda sd: sd.solar_data(DAY)),
+    ("solar_data next poll", warm, lambda sd: sd.solar_data(EVENING)),
+    (
+        "solar_data presence only",
+        warm,
+        lambda sd: sd.solar_data(EVENING, sections=("presence",)),
+    ),
+    ("presence", cold, lambda sd: sd.presence(DAY)),
+    ("bins", cold, lambda sd: sd.bins(DAY)),
+    ("clear", nothing, lambda sd: sd.display.clear()),
+    ("fill_polygon", cold, lambda sd: sd.display.fill_polygon(3, 87, 35, 8, 0x4218, 0)),
+    (
+        "draw_polygon",
+        cold,
+        lambda sd: sd.display.draw_polygon(7, 120, 160, 60, 0xFFFF, 10),
+    ),
+    ("draw_circle", cold, lambda sd: sd.display.draw_circle(14, 251, 12, 0x8618)),
+    (
+        "draw_text landscape",
+        cold,
+        lambda sd: sd.display.draw_text(65, 300, "4.32", font, 0xC7FF, landscape=True),
+    ),
+    (
+        "draw_text portrait",
+        cold,
+        lambda sd: sd.display.draw_text(10, 100, "4.32", font, 0xC7FF),
+    ),
+    (
+        "draw_image",
+        cold,
+        lambda sd: sd.display.draw_image(
+            "images/wheelie-bin-bk-48x33.raw", 183, 17, 48, 33
+        ),
+    ),
+)
+
+
+def count_blocks(display):
+    """Wrap display.block() to count calls, returning the counter."""
+    counter = [0]
+    block = display.block
+
+    def counted(*args):
+        counter[0] += 1
+        return block(*args)
+
+    display.block = counted
+    return counter
+
+
+def run(sd, panel, blocks, setup, scenario, repeats):
+    """Run a scenario, returning its counts and best CPU time."""
+    best = None
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup(sd)
+            panel.reset_counters()
+            blocks[0] = 0
+            start = process_time()
+            scenario(sd)
+            elapsed = (process_time() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    result = {"blocks": blocks[0], "cpu_ms": round(best, 3)}
+    stats = panel.stats()
+    for name in COUNTS[1:]:
+        result[name] = stats[name]
+    return result
+
+
+def regressions(result, base):
+    """Return descriptions of how a result is worse than its baseline."""
+    worse = []
+    for name in COUNTS:
+        if result[name] > base[name]:
+            worse.append("{} {} > {}".format(name, result[name], base[name]))
+    limit = base["cpu_ms"] * TIME_TOLERANCE + TIME_SLACK
+    if result["cpu_ms"] > limit:
+        worse.append("cpu_ms {:.2f} > {:.2f}".format(result["cpu_ms"], limit))
+    return worse
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    update = "--update" in args
+    if update:
+        args.remove("--update")
+    repeats = int(args[0]) if args else 5
+
+    board = sim.install()
+    chdir(ROOT)  # fonts and images are loaded relative to the project
+    from include import solar_display  # noqa: E402
+    from include.solar_display import SolarDisplay, font  # noqa: E402
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sd = SolarDisplay()
+    blocks = count_blocks(sd.display)
+    baseline = {}
+    if path.exists(BASELINE) and not update:
+        with open(BASELINE, "r") as f:
+            baseline = json.load(f)
+
+    print(
+        "{:<26} {:>9} {:>7} {:>7} {:>9} {:>9}".format(
+            "scenario", "cpu ms", "blocks", "trans", "cmd B", "pixel B"
+        )
+    )
+    results = {}
+    failed = []
+    for name, setup, scenario in SCENARIOS:
+        result = run(sd, board.panel, blocks, setup, scenario, repeats)
+        results[name] = result
+        worse = regressions(result, baseline[name]) if name in baseline else []
+        print(
+            "{:<26} {cpu_ms:>9.2f} {blocks:>7} {transactions:>7} "
+            "{command_bytes:>9} {pixel_bytes:>9}{}".format(
+                name, "  REGRESSED: " + ", ".join(worse) if worse else "", **result
+            )
+        )
+        if worse:
+            failed.append(name)
+
+    print(
+        "\n{:<26} {:>9} {:>7} {:>7} {:>9}".format(
+            "glyph cache", "budget", "hits", "misses", "hit rate"
+        )
+    )
+    for name in ("font", "font_uom", "font_num", "font_icon"):
+        cache = getattr(solar_display, name).cache
+        if cache is None:
+            continue
+        lookups = cache.hits + cache.misses
+        print(
+            "{:<26} {:>9} {:>7} {:>7} {:>8.0f}%".format(
+                name,
+                cache.max_bytes,
+                cache.hits,
+                cache.misses,
+                100 * cache.hits / lookups if lookups else 0,
+            )
+        )
+
+    if update:
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Saved: " + BASELINE)
+    elif not baseline:
+        print("No baseline yet: run with --update to save one")
+    if failed:
+        print("{} scenario(s) regressed".format(len(failed)))
+        sys.exit(1)
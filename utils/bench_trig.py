@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Check and benchmark the fixed-point trig tables on CPython.
+
+Compares include.trig.isin()/icos() with math.sin()/cos() at every table
+step, then times the edge vectors arc_spans() takes from the tables
+against the float calculation.  Exits with an error if the table is less
+accurate than expected.  The tables are used for gauge arcs, whose
+half-plane tests they make exact integer maths; polygon vertices keep
+float maths, as table vertices were no faster and moved some by a pixel.
+CPython timings only show call overhead: the saving on the board is that
+table lookups make no floats, each of which is a heap allocation there.
+Usage:
+    python utils/bench_trig.py [repeats]
+    repeats is the number of timed passes (default 2000).
+"""
+
+from math import cos, pi, radians, sin
+from os import path
+from time import perf_counter
+import sys
+
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import sim  # noqa: E402
+from include.trig import ONE, STEPS, icos, isin, steps  # noqa: E402
+
+# Largest error allowed in sin/cos (rounding only)
+MAX_ERROR = 0.5 / ONE + 1e-12
+# Gauge angles in degrees, as arc_degrees() gives them
+ANGLES = range(0, 181, 7)
+
+
+def float_vector(degrees):
+    """Arc edge vector worked out with floats."""
+    t = radians(90 + degrees)
+    return cos(t), sin(t)
+
+
+def table_vector(degrees):
+    """Arc edge vector from the tables, as arc_spans() works it out."""
+    t = steps(90 + degrees)
+    return icos(t), isin(t)
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sim.install()
+
+    worst = 0
+    for step in range(-STEPS, 2 * STEPS):
+        angle = 2 * pi * step / STEPS
+        worst = max(
+            worst,
+            abs(isin(step) / ONE - sin(angle)),
+            abs(icos(step) / ONE - cos(angle)),
+        )
+    print(
+        "sin/cos: worst error {:.2e} ({:.2f} of 1/{})".format(worst, worst * ONE, ONE)
+    )
+    if worst > MAX_ERROR:
+        error("Table error above {:.2e}".format(MAX_ERROR))
+
+    for name, vector in (("float", float_vector), ("table", table_vector)):
+        start = perf_counter()
+        for _ in range(repeats):
+            for degrees in ANGLES:
+                vector(degrees)
+        elapsed = perf_counter() - start
+        print(
+            "{} arc vectors: {:.2f} us per angle".format(
+                name, elapsed * 1e6 / (repeats * len(ANGLES))
+            )
+        )
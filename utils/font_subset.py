@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Utility to cut the project fonts down to the letters the display draws.
+
+Each font below lists the strings SolarDisplay renders with it.  Strings
+containing {} fields are format templates, expanded with sample values to
+find every character a number can produce.  The remap table stores a
+glyph under the character the display code uses, so a font's stand-in
+glyphs (eg. the % sign drawn at '/') need no lookup when drawing.
+The subset fonts are saved in binary format with a character map, and
+replace the files converted by xglcd2bin.py.
+Usage:
+    python utils/font_subset.py
+"""
+
+from os import path
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from include.xglcd_font import XglcdFont  # noqa: E402
+from xglcd2bin import count_letters, write_font  # noqa: E402
+
+# Values used to expand format templates (signs, decimals, large numbers)
+SAMPLES = (-1234.5678, -0.5, 0, 7, 9876.54321, 123456789.0)
+
+# Source file, width, height, start letter, strings drawn, remap table
+FONTS = (
+    (
+        "fonts/FuturaNum21x39.c",
+        21,
+        39,
+        46,
+        # values (str() of floats, cut to 4 characters) and the IP address
+        ("{}", "{:.0f}", "192.168.1.1"),
+        {},
+    ),
+    (
+        "fonts/Calibri12x14.c",
+        12,
+        14,
+        87,
+        # units, and the agile rate in pence
+        ("kWxnow", "Wxnow", "kWhxtodey", "{:.2f}p"),
+        # rate digits are the second set of numerals in the font
+        {
+            "0": "X",
+            "1": "Y",
+            "2": "Z",
+            "3": "[",
+            "4": "\\",
+            "5": "]",
+            "6": "^",
+            "7": "_",
+            "8": "`",
+            "9": "a",
+            ".": "b",
+            "-": "j",
+        },
+    ),
+    (
+        "fonts/FuturaNum17x21.c",
+        17,
+        21,
+        46,
+        # battery percentage, hh:mm timestamp and presence figures
+        ("{:.0f}%", "0123456789:", ";<=>"),
+        {"%": "/"},
+    ),
+    (
+        "fonts/Emoji24x24.c",
+        24,
+        24,
+        49,
+        # sun, partial cloud, cloud, zap, plug, up, down
+        ("1234567",),
+        {},
+    ),
+)
+
+
+def characters(strings):
+    """Return the set of characters drawn for a list of strings."""
+    chars = set()
+    for text in strings:
+        if "{" in text:
+            for value in SAMPLES:
+                chars.update(text.format(value))
+        else:
+            chars.update(text)
+    return chars
+
+
+def subset(font, strings, remap):
+    """Work out which letters of a font to keep.
+
+    Args:
+        font (XglcdFont): Loaded font.
+        strings (list): Strings and format templates drawn with the font.
+        remap (dict): Character drawn to character of the glyph in the font.
+    Returns:
+        list: (character code, letter index) pairs.
+        list: Characters drawn that the font does not contain.
+    """
+    letters = []
+    missing = []
+    for char in sorted(characters(strings)):
+        index = font.letter_index(remap.get(char, char))
+        if index < 0 or not font.glyph_width(index):
+            missing.append(char)
+        else:
+            letters.append((ord(char), index))
+    return letters, missing
+
+
+if __name__ == "__main__":
+    for font_path, width, height, start, strings, remap in FONTS:
+        in_path = path.join(ROOT, font_path)
+        font = XglcdFont(
+            in_path, width, height, start, count_letters(in_path), cache_bytes=0
+        )
+        letters, missing = subset(font, strings, remap)
+        out_path = path.splitext(in_path)[0] + ".bin"
+        with open(out_path, "wb") as f:
+            write_font(f, font, letters)
+        print(
+            "Saved: {} ({} of {} letters, {} bytes): {}".format(
+                path.relpath(out_path, ROOT),
+                len(letters),
+                font.letter_count,
+                path.getsize(out_path),
+                "".join(chr(c) for c, i in letters),
+            )
+        )
+        if missing:
+            print("  Not in font: " + "".join(missing))
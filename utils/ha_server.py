@@ -0,0 +1,634 @@
+# -*- coding: utf-8 -*-
+"""Stand-in Home Assistant server for trying the display's HTTP client.
+
+Serves /api/states/input_text.solar_display_data with the sample 'info'
+attributes from simulate.py (or JSON files, one per request in turn), and
+can stall or drip-feed responses to exercise the client's timeouts.
+Usage:
+    python utils/ha_server.py [frame.json ...] [--port 8123] [--delay ms]
+                              [--drip ms] [--chunked] [--idle ms]
+                              [--push ms]
+    python utils/ha_server.py --check
+    --delay waits before sending the response headers, --drip sends the
+    body 64 bytes at a time with a pause between, and --chunked uses
+    chunked transfer encoding.  Connections are kept alive between
+    requests until they are idle for --idle ms (default 75000, as Home
+    Assistant).  --check starts the server in-process and runs
+    include/http_client.py against it in each mode, checking the results,
+    the timeouts, that other tasks keep running meanwhile, that kept
+    connections are reused or replaced, that an address that stops
+    answering is looked up again, and that the info attributes are
+    picked out of responses as they stream in.
+    /api/websocket speaks enough of the WebSocket API for
+    include/ha_websocket.py: any token is accepted, and with --push the
+    next frame is sent to subscribers as a state change every --push ms.
+    --check also covers pushed updates, pings and dropped sockets.
+"""
+
+from base64 import b64encode
+from hashlib import sha1
+from os import path
+from struct import pack, unpack
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+from simulate import SAMPLE  # noqa: E402
+
+ENTITY = "input_text.solar_display_data"
+DRIP_BYTES = 64
+CONTEXT = {"id": "01HM2Q8K3Y7N5B0C4D6E8F0G2H", "parent_id": None, "user_id": None}
+# Added to the client's key for Sec-WebSocket-Accept (RFC 6455)
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+async def ws_read(reader):
+    """Return the opcode and unmasked payload of a client's next frame."""
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = unpack(">H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = unpack(">Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if head[1] & 0x80 else bytes(4)
+    payload = bytearray(await reader.readexactly(length))
+    for i in range(length):
+        payload[i] ^= mask[i & 3]
+    return head[0] & 0x0F, bytes(payload)
+
+
+def ws_send(writer, msg):
+    """Send a message to a client in one unmasked text frame."""
+    payload = json.dumps(msg).encode()
+    n = len(payload)
+    if n < 126:
+        head = pack(">BB", 0x81, n)
+    elif n < 0x10000:
+        head = pack(">BBH", 0x81, 126, n)
+    else:
+        head = pack(">BBQ", 0x81, 127, n)
+    writer.write(head + payload)
+
+
+class Server(object):
+    """HTTP and WebSocket server answering like Home Assistant.
+
+    Attributes:
+        frames: 'info' attributes served in turn
+        delay: Milliseconds to wait before the response headers
+        drip: Milliseconds between DRIP_BYTES pieces of the body (0 = all
+            at once)
+        chunked: Send the body with chunked transfer encoding
+        idle: Milliseconds a kept-alive connection may wait for the next
+            request before it is dropped without notice
+        token: Access token WebSocket clients must give (None = any)
+        pong: Answer WebSocket pings
+        requests: Number of requests served
+        connections: Number of connections accepted
+        pushes: Number of updates pushed to WebSocket subscribers
+        subscribers: (writer, subscription id) of each WebSocket subscriber
+    """
+
+    def __init__(self, frames, delay=0, drip=0, chunked=False, idle=75000, token=None):
+        self.frames = frames
+        self.delay = delay
+        self.drip = drip
+        self.chunked = chunked
+        self.idle = idle
+        self.token = token
+        self.pong = True
+        self.requests = 0
+        self.connections = 0
+        self.pushes = 0
+        self.subscribers = []
+        self.websockets = []
+
+    def state(self, info):
+        """Return the entity's state object holding some info attributes."""
+        changed = info.get("timestamp", "") + ".123456+00:00"
+        return {
+            "entity_id": ENTITY,
+            "state": json.dumps(info)[:255],
+            "attributes": {
+                "initial": None,
+                "editable": False,
+                "min": 0,
+                "max": 255,
+                "pattern": None,
+                "mode": "text",
+                "info": info,
+                "friendly_name": "Solar display data",
+            },
+            "last_changed": changed,
+            "last_reported": changed,
+            "last_updated": changed,
+            "context": CONTEXT,
+        }
+
+    def body(self, request_path):
+        """Return the status and JSON body for a request path."""
+        if request_path != "/api/states/" + ENTITY:
+            return "404 Not Found", {"message": "Entity not found."}
+        info = self.frames[self.requests % len(self.frames)]
+        self.requests += 1
+        return "200 OK", self.state(info)
+
+    async def respond(self, writer, status, body, keep_alive):
+        """Send one response."""
+        body = json.dumps(body).encode()
+        await asyncio.sleep(self.delay / 1000)
+        head = "HTTP/1.1 {}\r\nContent-Type: application/json\r\n".format(status)
+        if self.chunked:
+            head += "Transfer-Encoding: chunked\r\n"
+        else:
+            head += "Content-Length: {}\r\n".format(len(body))
+        head += "Connection: {}\r\n\r\n".format("keep-alive" if keep_alive else "close")
+        writer.write(head.encode())
+        step = DRIP_BYTES if self.drip else len(body)
+        for i in range(0, len(body), step):
+            piece = body[i : i + step]
+            if self.chunked:
+                piece = b"%x\r\n%s\r\n" % (len(piece), piece)
+            writer.write(piece)
+            await writer.drain()
+            if self.drip:
+                await asyncio.sleep(self.drip / 1000)
+        if self.chunked:
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(
+                        reader.readline(), self.idle / 1000
+                    )
+                except asyncio.TimeoutError:
+                    break  # idle too long: hang up like HA's web server
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                request_path = request_line.split()[1].decode()
+                if request_path == "/api/websocket":
+                    await self.websocket(reader, writer, headers)
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, body = self.body(request_path)
+                await self.respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def websocket(self, reader, writer, headers):
+        """Talk the Home Assistant WebSocket API with one client."""
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = b64encode(sha1(key + WS_GUID).digest()).decode()
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                "Connection: Upgrade\r\nSec-WebSocket-Accept: {}\r\n\r\n"
+            )
+            .format(accept)
+            .encode()
+        )
+        self.websockets.append(writer)
+        try:
+            ws_send(writer, {"type": "auth_required", "ha_version": "2024.1.0"})
+            msg = json.loads((await ws_read(reader))[1])
+            if self.token is not None and msg.get("access_token") != self.token:
+                ws_send(
+                    writer,
+                    {
+                        "type": "auth_invalid",
+                        "message": "Invalid access token or password",
+                    },
+                )
+                await writer.drain()
+                return
+            ws_send(writer, {"type": "auth_ok", "ha_version": "2024.1.0"})
+            while True:
+                opcode, payload = await ws_read(reader)
+                if opcode == 0x8:
+                    return
+                if opcode != 0x1:
+                    continue
+                msg = json.loads(payload)
+                if msg.get("type") == "subscribe_trigger":
+                    self.subscribers.append((writer, msg["id"]))
+                    ws_send(
+                        writer,
+                        {
+                            "id": msg["id"],
+                            "type": "result",
+                            "success": True,
+                            "result": None,
+                        },
+                    )
+                elif msg.get("type") == "ping" and self.pong:
+                    ws_send(writer, {"id": msg["id"], "type": "pong"})
+                await writer.drain()
+        finally:
+            self.subscribers = [sub for sub in self.subscribers if sub[0] is not writer]
+            self.websockets.remove(writer)
+
+    def push(self):
+        """Push the next frame to every WebSocket subscriber."""
+        old = self.frames[(self.pushes - 1) % len(self.frames)]
+        new = self.frames[self.pushes % len(self.frames)]
+        self.pushes += 1
+        for writer, sub_id in self.subscribers:
+            ws_send(
+                writer,
+                {
+                    "id": sub_id,
+                    "type": "event",
+                    "event": {
+                        "variables": {
+                            "trigger": {
+                                "id": "0",
+                                "idx": "0",
+                                "alias": None,
+                                "platform": "state",
+                                "entity_id": ENTITY,
+                                "from_state": self.state(old),
+                                "to_state": self.state(new),
+                                "for": None,
+                                "attribute": None,
+                                "description": "state of " + ENTITY,
+                            }
+                        },
+                        "context": CONTEXT,
+                    },
+                },
+            )
+
+    def drop_websockets(self):
+        """Close every WebSocket without a closing handshake."""
+        for writer in self.websockets:
+            writer.close()
+
+    async def start(self, port=0):
+        """Start listening on localhost and return the port."""
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        return self.server.sockets[0].getsockname()[1]
+
+
+async def fetch(url, timeouts=None):
+    """Fetch a URL with the display's client while counting loop ticks.
+
+    Returns:
+        (object, int, float): Response or exception, 10 ms ticks of another
+        task during the request, and elapsed milliseconds.
+    """
+    from include import http_client
+
+    ticks = 0
+    done = False
+
+    async def ticker():
+        nonlocal ticks
+        while not done:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    start = time.monotonic()
+    try:
+        result = await http_client.get(url, timeouts=timeouts)
+    except Exception as e:
+        result = e
+    done = True
+    await task
+    return result, ticks, (time.monotonic() - start) * 1000
+
+
+async def check():
+    """Run the client against the server in each mode."""
+    from include.http_client import HTTPTimeout
+
+    failures = 0
+    cases = (
+        # name, server settings, client timeouts, expected outcome
+        ("plain", {}, None, "ok"),
+        ("chunked", {"chunked": True}, None, "ok"),
+        ("drip-fed", {"drip": 20}, None, "ok"),
+        ("chunked drip-fed", {"drip": 20, "chunked": True}, None, "ok"),
+        ("slow headers", {"delay": 500}, {"headers": 200}, "headers"),
+        ("slow body", {"drip": 100}, {"body": 300}, "body"),
+        ("missing entity", {}, None, 404),
+    )
+    for name, settings, timeouts, expected in cases:
+        server = Server([SAMPLE], **settings)
+        port = await server.start()
+        url = "http://127.0.0.1:{}/api/states/{}".format(port, ENTITY)
+        if expected == 404:
+            url += "_missing"
+        result, ticks, elapsed = await fetch(url, timeouts)
+        server.server.close()
+        if expected == "ok":
+            passed = (
+                getattr(result, "status_code", None) == 200
+                and result.json()["attributes"]["info"] == SAMPLE
+            )
+        elif expected == 404:
+            passed = getattr(result, "status_code", None) == 404
+        else:
+            passed = isinstance(result, HTTPTimeout) and str(result).startswith(
+                expected
+            )
+        # The loop ticks every 10 ms unless the request blocks it
+        if elapsed > 100 and ticks < elapsed / 20:
+            passed = False
+        failures += not passed
+        print(
+            "{:<18} {:<5} {:>6.0f} ms {:>4} ticks  {}".format(
+                name,
+                "ok" if passed else "FAIL",
+                elapsed,
+                ticks,
+                result if isinstance(result, Exception) else result.status_code,
+            )
+        )
+    return (
+        failures
+        + await check_keep_alive()
+        + await check_extract()
+        + await check_websocket()
+    )
+
+
+async def check_keep_alive():
+    """Make polls on one kept connection, with and without idle drops."""
+    from include.http_client import Connection
+
+    failures = 0
+    frames = [
+        dict(SAMPLE, timestamp="2024-01-01T12:3{}:56".format(i)) for i in range(3)
+    ]
+    for name, idle, gap, connects in (
+        ("kept alive", 75000, 50, 1),
+        ("dropped when idle", 30, 100, 3),
+    ):
+        server = Server(frames, idle=idle)
+        port = await server.start()
+        conn = Connection("http://127.0.0.1:{}".format(port))
+        passed = True
+        for frame in frames:
+            await asyncio.sleep(gap / 1000)
+            try:
+                resp = await conn.get("/api/states/" + ENTITY)
+                passed &= resp.json()["attributes"]["info"] == frame
+            except Exception as e:
+                print(e)
+                passed = False
+        await conn.close()
+        server.server.close()
+        stats = conn.stats()
+        passed &= (
+            server.connections == connects == stats["connects"]
+            and stats["reused"] == 3 - connects
+            and stats["reconnects"] == connects - 1
+            and stats["lookups"] == 0
+        )
+        failures += not passed
+        print("{:<18} {:<5} {}".format(name, "ok" if passed else "FAIL", stats))
+
+    # An address that refuses connections is looked up again, between polls
+    server = Server(frames)
+    port = await server.start()
+    conn = Connection(
+        "http://localhost:{}".format(port), addr="127.0.0.2", timeouts={"connect": 1000}
+    )
+    results = []
+    for _ in frames:
+        conn.refresh()
+        try:
+            resp = await conn.get("/api/states/" + ENTITY)
+            results.append(resp.json()["attributes"]["info"])
+        except OSError:
+            results.append(None)
+    await conn.close()
+    server.server.close()
+    stats = conn.stats()
+    passed = (
+        results == [None] + frames[:2]
+        and stats["lookups"] == 1
+        and stats["connects"] == 1
+        and conn.addr == "127.0.0.1"
+    )
+    failures += not passed
+    print("{:<18} {:<5} {}".format("moved address", "ok" if passed else "FAIL", stats))
+    return failures
+
+
+async def check_extract():
+    """Pick the info attributes out of responses as they stream in."""
+    from include.http_client import Connection
+    from include.json_stream import Extractor
+
+    failures = 0
+    path_ = "/api/states/" + ENTITY
+    for name, settings in (
+        ("extract", {}),
+        ("extract chunked", {"chunked": True, "drip": 5}),
+    ):
+        server = Server([SAMPLE], **settings)
+        port = await server.start()
+        conn = Connection("http://127.0.0.1:{}".format(port))
+        passed = True
+        for keys, expected in (
+            (("attributes", "info"), SAMPLE),
+            (("attributes", "missing"), KeyError),
+            (("attributes", "info", "timestamp"), SAMPLE["timestamp"]),
+        ):
+            try:
+                value = (await conn.get(path_, extract=keys)).value
+            except KeyError:
+                value = KeyError
+            passed &= value == expected
+        await conn.close()
+        server.server.close()
+        # Bodies are read to the end, so one connection serves every poll
+        passed &= conn.connects == 1 and conn.reused == 2
+        failures += not passed
+        print("{:<18} {:<5} {}".format(name, "ok" if passed else "FAIL", conn.stats()))
+
+    # Memory to parse a response, keeping the whole body or only the info
+    body = json.dumps(Server([SAMPLE]).body(path_)[1]).encode()
+    tracemalloc.start()
+    content = bytes(bytearray(body))  # the body as read from the socket
+    info = json.loads(content)["attributes"]["info"]
+    whole = tracemalloc.get_traced_memory()[1]
+    del content, info
+    tracemalloc.reset_peak()
+    extractor = Extractor(("attributes", "info"))
+    for i in range(0, len(body), 256):
+        extractor.feed(bytes(bytearray(body[i : i + 256])))
+    extracted = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    passed = extractor.value == SAMPLE and extracted < whole
+    failures += not passed
+    print(
+        "{:<18} {:<5} peak {} bytes for a {} byte body, {} keeping it".format(
+            "extract memory", "ok" if passed else "FAIL", extracted, len(body), whole
+        )
+    )
+    return failures
+
+
+async def check_websocket():
+    """Take pushed updates over the WebSocket API, and lose them."""
+    from include.ha_websocket import HAWebSocket
+    from include.http_client import HTTPTimeout
+
+    failures = 0
+    frames = [
+        dict(SAMPLE, timestamp="2024-01-01T12:3{}:56".format(i)) for i in range(3)
+    ]
+    server = Server(frames, token="secret")
+    port = await server.start()
+    url = "http://127.0.0.1:{}".format(port)
+
+    async def listen(ws, updates):
+        """Connect and collect (info, arrival time) until the socket fails."""
+        await ws.connect()
+        try:
+            await ws.listen(
+                ENTITY, lambda info: updates.append((info, time.monotonic()))
+            )
+        except Exception as e:
+            return e
+        finally:
+            await ws.close()
+
+    async def settle(task):
+        """Wait for the listener to subscribe, or to fail."""
+        for _ in range(100):
+            if server.subscribers or task.done():
+                return
+            await asyncio.sleep(0.01)
+
+    # Pushed updates arrive in order, soon after the change
+    ws = HAWebSocket(url, "secret", ping_ms=100, timeout_ms=1000)
+    updates = []
+    task = asyncio.create_task(listen(ws, updates))
+    await settle(task)
+    sent = []
+    for _ in frames:
+        sent.append(time.monotonic())
+        server.push()
+        await asyncio.sleep(0.05)
+    latency = max((got - pushed) * 1000 for (_, got), pushed in zip(updates, sent))
+    passed = [info for info, _ in updates] == frames and latency < 50
+    failures += not passed
+    print(
+        "{:<18} {:<5} {:.1f} ms worst latency {}".format(
+            "ws push", "ok" if passed else "FAIL", latency, ws.stats()
+        )
+    )
+
+    # Idle connections are pinged, and a dropped one ends listen()
+    await asyncio.sleep(0.35)
+    pings = ws.pings
+    server.drop_websockets()
+    result = await asyncio.wait_for(task, 2)
+    passed = pings >= 2 and isinstance(result, Exception)
+    failures += not passed
+    print(
+        "{:<18} {:<5} {} pings, then {!r}".format(
+            "ws pings, drop", "ok" if passed else "FAIL", pings, result
+        )
+    )
+
+    # Pings that go unanswered end listen() too
+    server.pong = False
+    ws = HAWebSocket(url, "secret", ping_ms=100, timeout_ms=1000)
+    task = asyncio.create_task(listen(ws, []))
+    await settle(task)
+    result = await asyncio.wait_for(task, 2)
+    passed = isinstance(result, HTTPTimeout)
+    failures += not passed
+    print("{:<18} {:<5} {!r}".format("ws no pongs", "ok" if passed else "FAIL", result))
+
+    # A wrong token is refused
+    ws = HAWebSocket(url, "wrong")
+    try:
+        await ws.connect()
+        result = None
+    except OSError as e:
+        result = e
+    await ws.close()
+    server.server.close()
+    passed = str(result).startswith("Authentication failed")
+    failures += not passed
+    print("{:<18} {:<5} {}".format("ws bad token", "ok" if passed else "FAIL", result))
+    return failures
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"--port": 8123, "--delay": 0, "--drip": 0, "--idle": 75000, "--push": 0}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            if i + 1 >= len(args) or not args[i + 1].isdigit():
+                error("Please give a number after " + option)
+            options[option] = int(args[i + 1])
+            del args[i : i + 2]
+    chunked = "--chunked" in args
+    if chunked:
+        args.remove("--chunked")
+
+    sim.install()
+    if "--check" in args:
+        sys.exit(1 if asyncio.run(check()) else 0)
+    frames = []
+    for in_path in args:
+        if not path.exists(in_path):
+            error("File Not Found: " + in_path)
+        with open(in_path, "r") as f:
+            frames.append(json.load(f))
+
+    async def serve():
+        server = Server(
+            frames or [SAMPLE],
+            options["--delay"],
+            options["--drip"],
+            chunked,
+            options["--idle"],
+        )
+        port = await server.start(options["--port"])
+        print("Serving http://127.0.0.1:{}/api/states/{}".format(port, ENTITY))
+        while options["--push"]:
+            await asyncio.sleep(options["--push"] / 1000)
+            server.push()
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
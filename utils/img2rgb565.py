@@ -1,17 +1,24 @@
 # -*- coding: utf-8 -*-
-"""Utility to convert images to raw RGB565 format.
+"""Utility to convert images to raw or run length encoded RGB565 format.
 
-Requires the Pillow library (pip install Pillow)
+Requires the Pillow library (pip install Pillow) to read images.
 Usage:
-    python img2rgb565.py <your_image>
+    python img2rgb565.py [--rle] <your_image> [width]
     <your_image> is the full path to the image file you want to convert.
+    --rle saves a run length encoded .rle file for Display.draw_rle_image()
+    instead of a .raw file for Display.draw_image().  An existing .raw file
+    can be encoded too (without Pillow), giving its width in pixels.
 """
 
-from PIL import Image
-from struct import pack
+from struct import pack, unpack
 from os import path
 import sys
 
+# Must match Display.RLE_MAGIC and Display.RLE_HEADER in include/ili9341.py
+RLE_MAGIC = b"RLE1"
+RLE_HEADER = "<4sHHH"
+MAX_RUN = 256
+
 
 def error(msg):
     """Display error and exit."""
@@ -19,27 +26,86 @@ def error(msg):
     sys.exit(-1)
 
 
-def write_bin(f, pixel_list):
-    """Save image in RGB565 format."""
-    for pix in pixel_list:
-        r = (pix[2] >> 3) & 0x1F
-        g = (pix[1] >> 2) & 0x3F
-        b = (pix[0] >> 3) & 0x1F
-        f.write(pack(">H", (r << 11) + (g << 5) + b))
+def rgb565(pix):
+    """Return the RGB565 color of an RGB pixel (red and blue swapped)."""
+    r = (pix[2] >> 3) & 0x1F
+    g = (pix[1] >> 2) & 0x3F
+    b = (pix[0] >> 3) & 0x1F
+    return (r << 11) + (g << 5) + b
+
+
+def write_bin(f, colors):
+    """Save RGB565 colors in raw format."""
+    f.write(pack(">{}H".format(len(colors)), *colors))
+
+
+def write_rle(f, colors, width, height):
+    """Save RGB565 colors as palette indexes, run length encoded.
+
+    Returns:
+        Number of runs written.
+    """
+    palette = sorted(set(colors))
+    if len(palette) > 256:
+        error("Too many colors for RLE ({}), save as raw".format(len(palette)))
+    index = {color: i for i, color in enumerate(palette)}
+    f.write(pack(RLE_HEADER, RLE_MAGIC, width, height, len(palette)))
+    f.write(pack(">{}H".format(len(palette)), *palette))
+    runs = bytearray()
+    i = 0
+    while i < len(colors):
+        color = colors[i]
+        n = 1
+        while n < MAX_RUN and i + n < len(colors) and colors[i + n] == color:
+            n += 1
+        runs += bytes((n - 1, index[color]))
+        i += n
+    f.write(runs)
+    return len(runs) // 2
 
 
 if __name__ == "__main__":
-    args = sys.argv
-    if len(args) != 2:
-        error("Please specify input file: ./img2rgb565.py test.png")
-    in_path = args[1]
+    args = sys.argv[1:]
+    rle = "--rle" in args
+    if rle:
+        args.remove("--rle")
+    if len(args) not in (1, 2):
+        error("Please specify input file: ./img2rgb565.py [--rle] test.png")
+    in_path = args[0]
     if not path.exists(in_path):
         error("File Not Found: " + in_path)
 
     filename, ext = path.splitext(in_path)
-    out_path = filename + ".raw"
-    img = Image.open(in_path).convert("RGB")
-    pixels = list(img.getdata())
-    with open(out_path, "wb") as f:
-        write_bin(f, pixels)
-    print("Saved: " + out_path)
+    if ext.lower() == ".raw":
+        if not rle or len(args) != 2:
+            error("Give --rle and the width to encode a raw file")
+        with open(in_path, "rb") as f:
+            data = f.read()
+        if not args[1].isdigit() or not int(args[1]):
+            error("Please give the width in pixels, eg. 48")
+        width = int(args[1])
+        height = len(data) // 2 // width
+        if width * height * 2 != len(data):
+            error("File size does not match a width of {}".format(width))
+        colors = list(unpack(">{}H".format(len(data) // 2), data))
+    else:
+        from PIL import Image
+
+        img = Image.open(in_path).convert("RGB")
+        width, height = img.size
+        colors = [rgb565(pix) for pix in img.getdata()]
+
+    if rle:
+        out_path = filename + ".rle"
+        with open(out_path, "wb") as f:
+            runs = write_rle(f, colors, width, height)
+        print(
+            "Saved: {} ({} runs, {} bytes)".format(
+                out_path, runs, path.getsize(out_path)
+            )
+        )
+    else:
+        out_path = filename + ".raw"
+        with open(out_path, "wb") as f:
+            write_bin(f, colors)
+        print("Saved: " + out_path)
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""Stand-in MQTT broker for trying the display's MQTT client.
+
+A small MQTT 3.1.1 broker (QoS 0 only) that keeps retained messages and
+drops clients that go quiet for 1.5 times their keepalive, as brokers
+do.  It can publish the sample 'info' attributes from simulate.py (or
+JSON files, one per publish in turn) as retained messages, the way
+pyscript/solar_data.py does.
+Usage:
+    python utils/mqtt_broker.py [frame.json ...] [--port 1883]
+                                [--publish ms] [--topic solar_display/info]
+    python utils/mqtt_broker.py --check
+    --publish sends the next frame every --publish ms.  --check starts the
+    broker in-process and runs include/mqtt_client.py against it, checking
+    that the retained message arrives on connecting, that later ones
+    follow in order, that idle connections are kept alive with pings,
+    that dropped connections and unanswered pings end listen(), and that
+    a wrong password is refused.
+"""
+
+from os import path
+from struct import pack, unpack
+import asyncio
+import json
+import sys
+import time
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+from simulate import SAMPLE  # noqa: E402
+
+TOPIC = "solar_display/info"
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+def matches(pattern, topic):
+    """Return True if a topic matches a subscription's + and # wildcards."""
+    want = pattern.split("/")
+    have = topic.split("/")
+    for i, level in enumerate(want):
+        if level == "#":
+            return True
+        if i >= len(have) or level not in ("+", have[i]):
+            return False
+    return len(want) == len(have)
+
+
+def string(body, i):
+    """Return the MQTT string at body[i:] and the index after it."""
+    n = unpack(">H", body[i : i + 2])[0]
+    return body[i + 2 : i + 2 + n].decode(), i + 2 + n
+
+
+def packet(first, body):
+    """Return a control packet, its remaining length encoded in front."""
+    head = bytearray((first,))
+    n = len(body)
+    while True:
+        head.append((n & 0x7F) | (0x80 if n > 0x7F else 0))
+        n >>= 7
+        if not n:
+            return bytes(head) + body
+
+
+class Broker(object):
+    """MQTT broker on localhost.
+
+    Attributes:
+        password: Password clients must give (None = any)
+        pong: Answer pings
+        retained: Retained message payload of each topic
+        clients: (writer, subscriptions) of each connected client
+        connections: Number of connections accepted
+        dropped: Number of clients dropped for going quiet
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+        self.pong = True
+        self.retained = {}
+        self.clients = []
+        self.connections = 0
+        self.dropped = 0
+
+    def publish(self, topic, payload, retain=False):
+        """Send a message to the subscribers of its topic."""
+        if retain:
+            self.retained[topic] = payload
+        data = packet(0x30, pack(">H", len(topic)) + topic.encode() + payload)
+        for writer, subscriptions in self.clients:
+            if any(matches(pattern, topic) for pattern in subscriptions):
+                writer.write(data)
+
+    async def read(self, reader, keepalive):
+        """Return a client's next packet, waiting 1.5 times its keepalive."""
+        first = await asyncio.wait_for(
+            reader.readexactly(1), keepalive * 1.5 if keepalive else None
+        )
+        length = shift = 0
+        while True:
+            digit = (await reader.readexactly(1))[0]
+            length |= (digit & 0x7F) << shift
+            shift += 7
+            if not digit & 0x80:
+                break
+        return first[0], await reader.readexactly(length)
+
+    async def handle(self, reader, writer):
+        """Serve one client until it disconnects or goes quiet."""
+        self.connections += 1
+        subscriptions = []
+        client = (writer, subscriptions)
+        try:
+            first, body = await self.read(reader, 10)
+            if first != 0x10:
+                return
+            flags, keepalive = unpack(">BH", body[7:10])
+            i = string(body, 10)[1]  # after the client id
+            password = None
+            if flags & 0x80:
+                i = string(body, i)[1]  # user name, not checked
+            if flags & 0x40:
+                password, i = string(body, i)
+            if self.password is not None and password != self.password:
+                writer.write(packet(0x20, b"\x00\x04"))
+                await writer.drain()
+                return
+            writer.write(packet(0x20, b"\x00\x00"))
+            self.clients.append(client)
+            while True:
+                first, body = await self.read(reader, keepalive)
+                kind = first & 0xF0
+                if kind == 0xE0:  # DISCONNECT
+                    return
+                if kind == 0x30:
+                    topic, i = string(body, 0)
+                    if first & 0x06:
+                        i += 2  # packet id, not acknowledged at QoS 0
+                    self.publish(topic, body[i:], retain=first & 0x01)
+                elif first == 0x82:  # SUBSCRIBE
+                    i = 2
+                    patterns = []
+                    while i < len(body):
+                        pattern, i = string(body, i)
+                        patterns.append(pattern)
+                        i += 1  # requested QoS, granted as 0
+                    subscriptions.extend(patterns)
+                    writer.write(packet(0x90, body[:2] + bytes(len(patterns))))
+                    for topic, payload in self.retained.items():
+                        if any(matches(p, topic) for p in patterns):
+                            writer.write(
+                                packet(
+                                    0x31,
+                                    pack(">H", len(topic)) + topic.encode() + payload,
+                                )
+                            )
+                elif first == 0xC0 and self.pong:  # PINGREQ
+                    writer.write(packet(0xD0, b""))
+                await writer.drain()
+        except asyncio.TimeoutError:
+            self.dropped += 1
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            if client in self.clients:
+                self.clients.remove(client)
+            writer.close()
+
+    def drop_clients(self):
+        """Close every connection without a DISCONNECT."""
+        for writer, _ in self.clients:
+            writer.close()
+
+    async def start(self, port=0):
+        """Start listening on localhost and return the port."""
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        return self.server.sockets[0].getsockname()[1]
+
+
+async def check():
+    """Run the client against the broker."""
+    from include.mqtt_client import MQTTClient
+
+    failures = 0
+    frames = [
+        dict(SAMPLE, timestamp="2024-01-01T12:3{}:56".format(i)) for i in range(3)
+    ]
+    broker = Broker(password="secret")
+    port = await broker.start()
+    broker.publish(TOPIC, json.dumps(frames[0]).encode(), retain=True)
+
+    async def listen(client, received):
+        """Connect and collect (info, arrival time) until the socket fails."""
+        await client.connect()
+        await client.subscribe(TOPIC)
+        try:
+            await client.listen(
+                lambda topic, payload: received.append(
+                    (json.loads(payload), time.monotonic())
+                )
+            )
+        except Exception as e:
+            return e
+        finally:
+            await client.close()
+
+    async def settle(task, received):
+        """Wait for the first message, or a failure."""
+        for _ in range(100):
+            if received or task.done():
+                return
+            await asyncio.sleep(0.01)
+
+    def report(name, passed, detail):
+        print("{:<18} {:<5} {}".format(name, "ok" if passed else "FAIL", detail))
+        return not passed
+
+    # The retained message arrives at once, published ones as they're sent
+    client = MQTTClient(
+        "127.0.0.1",
+        port,
+        user="display",
+        password="secret",
+        keepalive=1,
+        timeout_ms=1000,
+    )
+    received = []
+    start = time.monotonic()
+    task = asyncio.create_task(listen(client, received))
+    await settle(task, received)
+    boot = (time.monotonic() - start) * 1000
+    publisher = MQTTClient(
+        "127.0.0.1", port, user="pyscript", password="secret", timeout_ms=1000
+    )
+    await publisher.connect()
+    sent = []
+    for frame in frames[1:]:
+        sent.append(time.monotonic())
+        await publisher.publish(TOPIC, json.dumps(frame), retain=True)
+        await asyncio.sleep(0.05)
+    await publisher.close()
+    latency = max((got - pushed) * 1000 for (_, got), pushed in zip(received[1:], sent))
+    failures += report(
+        "retained, live",
+        [info for info, _ in received] == frames and boot < 100 and latency < 50,
+        "{:.0f} ms to the retained message, {:.1f} ms worst latency".format(
+            boot, latency
+        ),
+    )
+
+    # Pings keep an idle connection open past its keepalive
+    await asyncio.sleep(2)
+    passed = client.pings >= 3 and not task.done() and not broker.dropped
+    failures += report("keepalive", passed, client.stats())
+
+    # A dropped connection ends listen(); reconnecting gets the latest again
+    broker.drop_clients()
+    result = await asyncio.wait_for(task, 2)
+    received = []
+    task = asyncio.create_task(listen(client, received))
+    await settle(task, received)
+    passed = (
+        isinstance(result, Exception)
+        and client.connects == 2
+        and [info for info, _ in received] == frames[-1:]
+    )
+    failures += report("drop, reconnect", passed, repr(result))
+
+    # Pings that go unanswered end listen() too
+    broker.pong = False
+    result = await asyncio.wait_for(task, 4)
+    failures += report("no pongs", isinstance(result, OSError), repr(result))
+
+    # A wrong password is refused
+    client = MQTTClient("127.0.0.1", port, user="display", password="wrong")
+    try:
+        await client.connect()
+        result = None
+    except OSError as e:
+        result = e
+    await client.close()
+    broker.server.close()
+    failures += report(
+        "bad password", str(result).startswith("MQTT connection refused"), result
+    )
+    return failures
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"--port": "1883", "--publish": "0", "--topic": TOPIC}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            if i + 1 >= len(args):
+                error("Please give a value after " + option)
+            options[option] = args[i + 1]
+            del args[i : i + 2]
+    for option in ("--port", "--publish"):
+        if not options[option].isdigit():
+            error("Please give a number after " + option)
+
+    sim.install()
+    if "--check" in args:
+        sys.exit(1 if asyncio.run(check()) else 0)
+    frames = []
+    for in_path in args:
+        if not path.exists(in_path):
+            error("File Not Found: " + in_path)
+        with open(in_path, "r") as f:
+            frames.append(json.load(f))
+    frames = frames or [SAMPLE]
+
+    async def serve():
+        broker = Broker()
+        port = await broker.start(int(options["--port"]))
+        print("Broker on 127.0.0.1:{}, topic {}".format(port, options["--topic"]))
+        count = 0
+        while True:
+            frame = frames[count % len(frames)]
+            broker.publish(options["--topic"], json.dumps(frame).encode(), retain=True)
+            count += 1
+            if not int(options["--publish"]):
+                await broker.server.serve_forever()
+            await asyncio.sleep(int(options["--publish"]) / 1000)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Host simulator for running the display code under CPython.
+
+Provides stand-ins for the MicroPython modules the project imports
+(machine, framebuf, network, uasyncio, urequests and utime) plus the const()
+builtin.  SPI writes to the display are decoded by an ILI9341 model into
+an in-memory RGB565 framebuffer, which can be saved as a PNG, and the
+model counts SPI transactions and bytes.
+Usage:
+    import sim
+    board = sim.install()  # before importing main or include.*
+    ...
+    board.panel.png("screen.png")
+"""
+
+from importlib import import_module
+import builtins
+import sys
+
+# MicroPython module names provided by this package
+MODULES = ("machine", "framebuf", "network", "uasyncio", "urequests", "utime")
+
+
+def install():
+    """Register the simulated modules and the const() builtin.
+
+    Returns:
+        module: sim.board, which holds the simulated hardware.
+    """
+    if not hasattr(builtins, "const"):
+        builtins.const = lambda value: value
+    for name in MODULES:
+        sys.modules.setdefault(name, import_module("sim." + name))
+    return import_module("sim.board")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Simulated hardware shared by the machine and network modules.
+
+Wiring follows the ESP32 'Cheap Yellow Display' the project runs on: the
+ILI9341 panel sits on SPI bus 1 with chip select on GPIO 15 and
+data/command on GPIO 2.
+"""
+
+from sim.panel import Panel
+
+# Pin id to logic level (pins with the same id share a level)
+levels = {}
+# Pin id to interrupt handler
+handlers = {}
+# SPI bus id to list of (chip select pin, device)
+buses = {}
+
+# Addresses returned by network.WLAN.ifconfig()
+IFCONFIG = ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+
+
+def attach(bus, cs, device):
+    """Connect a device to an SPI bus.
+
+    Args:
+        bus (int): SPI bus id.
+        cs (int): Chip select pin id (device listens while it is low).
+        device: Object with a write(data) method.
+    """
+    buses.setdefault(bus, []).append((cs, device))
+
+
+def detach(bus, device):
+    """Disconnect a device from an SPI bus."""
+    buses[bus] = [(cs, d) for cs, d in buses.get(bus, ()) if d is not device]
+
+
+def set_level(pin, level):
+    """Drive a pin from outside (eg. press a button) and fire its handler."""
+    changed = levels.get(pin) != level
+    levels[pin] = level
+    handler = handlers.get(pin)
+    if changed and handler is not None:
+        handler(pin)
+
+
+def spi_write(bus, data):
+    """Deliver bytes written to an SPI bus to the selected devices."""
+    for cs, device in buses.get(bus, ()):
+        if not levels.get(cs, 1):
+            device.write(data)
+
+
+panel = Panel(levels, dc=2)
+attach(1, 15, panel)
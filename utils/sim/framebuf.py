@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Simulated framebuf module (RGB565 only)."""
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer(object):
+    """RGB565 frame buffer, stored little endian like on the ESP32.
+
+    Note:
+        There is no built in 8x8 font, so text() draws an outline box for
+        each character.
+    """
+
+    def __init__(self, buf, width, height, format, stride=None):
+        if format != RGB565:
+            raise ValueError("Only RGB565 is simulated")
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.stride = width if stride is None else stride
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x0 >= x1:
+            return
+        row = (c & 0xFFFF).to_bytes(2, "little") * (x1 - x0)
+        for yy in range(y0, y1):
+            offset = (yy * self.stride + x0) * 2
+            self.buf[offset : offset + len(row)] = row
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        offset = (y * self.stride + x) * 2
+        if c is None:
+            return self.buf[offset] | self.buf[offset + 1] << 8
+        self.buf[offset : offset + 2] = (c & 0xFFFF).to_bytes(2, "little")
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def text(self, s, x, y, c=1):
+        for i in range(len(s)):
+            self.rect(x + i * 8 + 1, y + 1, 6, 6, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Simulated machine module (Pin, SPI and reset)."""
+
+from sim import board
+
+
+class Pin(object):
+    """GPIO pin.  Pins created with the same id share one level."""
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.init(mode, pull, value)
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        """Configure the pin (inputs idle at their pull level)."""
+        if value is not None:
+            board.levels[self.id] = int(bool(value))
+        elif pull == self.PULL_UP:
+            board.levels.setdefault(self.id, 1)
+        else:
+            board.levels.setdefault(self.id, 0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        """Call handler(pin id) when the level is changed by the board."""
+        board.handlers[self.id] = handler
+
+    def off(self):
+        board.levels[self.id] = 0
+
+    def on(self):
+        board.levels[self.id] = 1
+
+    def value(self, value=None):
+        """Set the level, or return it when no value is given."""
+        if value is None:
+            return board.levels[self.id]
+        board.levels[self.id] = int(bool(value))
+
+
+class SPI(object):
+    """SPI bus.  Writes go to the devices board.attach() put on the bus."""
+
+    def __init__(self, id, *args, **kwargs):
+        self.id = id
+
+    def deinit(self):
+        pass
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def read(self, nbytes, write=0x00):
+        return bytes(nbytes)
+
+    def readinto(self, buf, write=0x00):
+        for i in range(len(buf)):
+            buf[i] = 0
+
+    def write(self, buf):
+        board.spi_write(self.id, buf)
+
+
+def freq(hz=None):
+    """Return the CPU frequency."""
+    return 240000000
+
+
+def reset():
+    """Reset the board, which ends the simulation."""
+    raise SystemExit("machine.reset()")
+
+
+def unique_id():
+    return b"\x00\x00\x00\x00\x00\x00"
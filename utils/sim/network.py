@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Simulated network module.  Connections always succeed at once."""
+
+from sim import board
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 1010
+
+
+class WLAN(object):
+    """Wi-Fi interface; the host's own network is used for traffic."""
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self.up = False
+        self.connected = False
+        self.settings = {}
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self.up
+        self.up = bool(is_active)
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self.settings.get(args[0])
+        self.settings.update(kwargs)
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        self.settings["ssid"] = ssid
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def ifconfig(self, config=None):
+        if config is not None:
+            board.IFCONFIG = tuple(config)
+            return None
+        if self.connected or self.interface == AP_IF:
+            return board.IFCONFIG
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def isconnected(self):
+        return self.connected
+
+    def scan(self):
+        return []
+
+    def status(self, param=None):
+        return STAT_GOT_IP if self.connected else STAT_IDLE
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""ILI9341 model that decodes the SPI stream into a framebuffer."""
+
+from struct import pack
+import zlib
+
+CASET = 0x2A  # Column address set
+PASET = 0x2B  # Page address set
+RAMWR = 0x2C  # Memory write
+MADCTL = 0x36  # Memory access control
+SWRESET = 0x01  # Software reset
+
+MADCTL_BGR = 0x08
+
+
+class Panel(object):
+    """Simulated ILI9341 panel.
+
+    Attributes:
+        width: Framebuffer width (column addresses)
+        height: Framebuffer height (page addresses)
+        fb: Big endian RGB565 pixels as addressed by CASET and PASET
+        madctl: Last memory access control value
+        transactions: Number of SPI writes received
+        bytes: Number of bytes received
+        command_bytes: Command and parameter bytes received
+        pixel_bytes: Pixel bytes received
+        windows: Number of memory writes (RAMWR commands)
+        commands: Command code to number of times sent
+
+    Note:
+        The framebuffer is kept in address space, the layout the drawing
+        code works in.  png() turns it into what the glass shows.
+    """
+
+    def __init__(self, levels, dc, width=240, height=320):
+        """Constructor for simulated panel.
+
+        Args:
+            levels (dict): Pin id to logic level of the board.
+            dc (int): Data/command pin id (low for commands).
+            width (int): Column address range (default 240).
+            height (int): Page address range (default 320).
+        """
+        self.levels = levels
+        self.dc = dc
+        self.width = width
+        self.height = height
+        self.fb = bytearray(width * height * 2)
+        self.madctl = 0
+        self.command = None
+        self.params = bytearray()
+        self.window = (0, 0, width - 1, height - 1)
+        self.x = self.y = 0
+        self.odd = b""
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Zero the transaction and byte counters."""
+        self.transactions = 0
+        self.bytes = 0
+        self.command_bytes = 0
+        self.pixel_bytes = 0
+        self.windows = 0
+        self.commands = {}
+
+    def stats(self):
+        """Return the counters.
+
+        Returns:
+            dict: transactions, bytes, command_bytes, pixel_bytes and windows.
+        """
+        return {
+            "transactions": self.transactions,
+            "bytes": self.bytes,
+            "command_bytes": self.command_bytes,
+            "pixel_bytes": self.pixel_bytes,
+            "windows": self.windows,
+        }
+
+    def write(self, data):
+        """Receive bytes while chip select is low."""
+        data = bytes(data)
+        self.transactions += 1
+        self.bytes += len(data)
+        if not self.levels.get(self.dc, 0):
+            self.command_bytes += len(data)
+            for command in data:
+                self.start(command)
+        elif self.command == RAMWR:
+            self.pixel_bytes += len(data)
+            self.pixels(data)
+        else:
+            self.command_bytes += len(data)
+            self.params += data
+            self.parameters()
+
+    def start(self, command):
+        """Begin a command."""
+        self.command = command
+        self.params = bytearray()
+        self.commands[command] = self.commands.get(command, 0) + 1
+        if command == RAMWR:
+            self.windows += 1
+            self.x, self.y = self.window[0], self.window[1]
+            self.odd = b""
+        elif command == SWRESET:
+            self.madctl = 0
+            self.window = (0, 0, self.width - 1, self.height - 1)
+
+    def parameters(self):
+        """Apply the parameters of the current command."""
+        params = self.params
+        x0, y0, x1, y1 = self.window
+        if self.command == CASET and len(params) >= 4:
+            x0 = params[0] << 8 | params[1]
+            x1 = params[2] << 8 | params[3]
+        elif self.command == PASET and len(params) >= 4:
+            y0 = params[0] << 8 | params[1]
+            y1 = params[2] << 8 | params[3]
+        elif self.command == MADCTL and params:
+            self.madctl = params[0]
+        self.window = (x0, y0, x1, y1)
+
+    def pixels(self, data):
+        """Write pixel data into the window, a row segment at a time."""
+        if self.odd:
+            data = self.odd + data
+        if len(data) & 1:
+            data, self.odd = data[:-1], data[-1:]
+        else:
+            self.odd = b""
+        x0, y0, x1, y1 = self.window
+        width = self.width
+        x, y = self.x, self.y
+        pos = 0
+        end = len(data)
+        while pos < end:
+            n = min(x1 - x + 1, (end - pos) >> 1)
+            if y < self.height and x < width:
+                # Clip the segment to the framebuffer
+                visible = min(n, width - x)
+                self.store(x, y, data[pos : pos + visible * 2])
+            pos += n * 2
+            x += n
+            if x > x1:
+                x = x0
+                y = y0 if y >= y1 else y + 1
+        self.x, self.y = x, y
+
+    def store(self, x, y, data):
+        """Write a row segment of pixel data to the framebuffer."""
+        offset = (y * self.width + x) * 2
+        self.fb[offset : offset + len(data)] = data
+
+    def pixel(self, x, y):
+        """Return the RGB565 value at an address."""
+        offset = (y * self.width + x) * 2
+        return self.fb[offset] << 8 | self.fb[offset + 1]
+
+    def png(self, path, rotate=90, bgr=None):
+        """Save the framebuffer as a PNG image.
+
+        Args:
+            path (string): Output file.
+            rotate (int): Clockwise rotation, 0, 90, 180 or 270 (default 90,
+                which is how the CYD shows the address space).
+            bgr (bool): Swap red and blue (default: MADCTL BGR bit).
+        """
+        if bgr is None:
+            bgr = bool(self.madctl & MADCTL_BGR)
+        rgb = {}
+
+        def colour(x, y):
+            c = self.pixel(x, y)
+            pixel = rgb.get(c)
+            if pixel is None:
+                r, g, b = c >> 11, c >> 5 & 0x3F, c & 0x1F
+                if bgr:
+                    r, b = b, r
+                pixel = bytes((r << 3 | r >> 2, g << 2 | g >> 4, b << 3 | b >> 2))
+                rgb[c] = pixel
+            return pixel
+
+        write_png(path, self.width, self.height, colour, rotate)
+
+
+def write_png(path, width, height, colour, rotate=0):
+    """Save an image of the address space as a PNG.
+
+    Args:
+        path (string): Output file.
+        width (int): Address space width.
+        height (int): Address space height.
+        colour (function): Returns 3 bytes of RGB for an address (x, y).
+        rotate (int): Clockwise rotation, 0, 90, 180 or 270 (default 0).
+    """
+    if rotate in (90, 270):
+        out_w, out_h = height, width
+    else:
+        out_w, out_h = width, height
+    raw = bytearray()
+    for row in range(out_h):
+        raw.append(0)  # no filter
+        for col in range(out_w):
+            if rotate == 90:
+                x, y = row, height - 1 - col
+            elif rotate == 180:
+                x, y = width - 1 - col, height - 1 - row
+            elif rotate == 270:
+                x, y = width - 1 - row, col
+            else:
+                x, y = col, row
+            raw += colour(x, y)
+
+    def chunk(kind, body):
+        return pack(">I", len(body)) + kind + body + pack(">I", zlib.crc32(kind + body))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", pack(">IIBBBBB", out_w, out_h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(bytes(raw))))
+        f.write(chunk(b"IEND", b""))
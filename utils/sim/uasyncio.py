@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Simulated uasyncio module, backed by asyncio."""
+
+from asyncio import *  # noqa: F401,F403
+import asyncio
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(awaitable, timeout):
+    return await asyncio.wait_for(awaitable, timeout / 1000)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Simulated urequests module, backed by urllib."""
+
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import json as _json
+
+
+class Response(object):
+    """HTTP response with the urequests attributes."""
+
+    def __init__(self, status_code, reason, headers, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.encoding = "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def close(self):
+        pass
+
+    def json(self):
+        return _json.loads(self.content)
+
+
+def request(method, url, data=None, json=None, headers=None, timeout=None):
+    """Make an HTTP request.
+
+    Args:
+        method (string): HTTP method.
+        url (string): Full URL.
+        data (bytes or string): Request body.
+        json: Object sent as a JSON body.
+        headers (dict): Request headers.
+        timeout (float): Socket timeout in seconds.
+    Returns:
+        Response: Status, headers and body (HTTP errors are returned too).
+    """
+    headers = dict(headers or {})
+    if json is not None:
+        data = _json.dumps(json)
+        headers.setdefault("Content-Type", "application/json")
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    req = Request(url, data=data, headers=headers, method=method)
+    try:
+        with urlopen(req, timeout=timeout) as resp:
+            return Response(resp.status, resp.reason, dict(resp.headers), resp.read())
+    except HTTPError as e:
+        return Response(e.code, e.reason, dict(e.headers), e.read())
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
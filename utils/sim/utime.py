@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Simulated utime module, backed by time."""
+
+from time import *  # noqa: F401,F403
+import time
+
+TICKS_PERIOD = 1 << 30
+
+
+def ticks_ms():
+    return int(time.monotonic() * 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return int(time.monotonic() * 1000000) % TICKS_PERIOD
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) % TICKS_PERIOD
+    return diff - TICKS_PERIOD if diff >= TICKS_PERIOD // 2 else diff
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
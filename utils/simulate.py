@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Utility to draw the solar display on the host with the simulator.
+
+Runs SolarDisplay under CPython with the modules in utils/sim, feeding it
+frames of Home Assistant data the way main.py does, and reports the SPI
+traffic of each frame.
+Usage:
+    python utils/simulate.py [frame.json ...] [-o screen.png]
+    Each frame is a JSON file holding the 'info' attributes of
+    input_text.solar_display_data (default: a built-in sample).  The
+    screen after the last frame is saved to screen.png.
+"""
+
+from os import chdir, path
+import json
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+# The same shape of data the pyscript service publishes
+SAMPLE = {
+    "solar_in": "4321",
+    "power_used": "2345",
+    "grid_in": "-1234",
+    "battery_per": "55",
+    "export_today": "12.3",
+    "solar_today": "23.4",
+    "grid_in_today": "33.3",
+    "cur_rate": "0.1234",
+    "solis_charging": "off",
+    "solis_discharging": "on",
+    "power_up": "off",
+    "presence": "jBC",
+    "bins": "bkbr",
+    "timestamp": "2024-01-01T12:34:56",
+}
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+def draw_frames(display, frames):
+    """Draw frames as main.display_data() does and print their traffic."""
+    from include.ha_validation import validate_ha_data, filter_valid_data
+
+    panel = board.panel
+    prev_battery_int = 0
+    for number, frame in enumerate(frames, 1):
+        is_valid, errors, warnings = validate_ha_data(frame)
+        if not is_valid:
+            error("Frame {}: {}".format(number, errors))
+        data = filter_valid_data(frame)
+        data["prev_battery_int"] = prev_battery_int
+        panel.reset_counters()
+        display.solar_data(data)
+        prev_battery_int = int(data["battery_per"])
+        print(
+            "Frame {}: {transactions} transactions, {windows} windows, "
+            "{bytes} bytes ({pixel_bytes} pixel)".format(number, **panel.stats())
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    out_path = path.abspath("screen.png")
+    if "-o" in args:
+        i = args.index("-o")
+        if i + 1 >= len(args):
+            error("Please specify output file: -o screen.png")
+        out_path = path.abspath(args[i + 1])
+        del args[i : i + 2]
+    frames = []
+    for in_path in args:
+        if not path.exists(in_path):
+            error("File Not Found: " + in_path)
+        with open(in_path, "r") as f:
+            frames.append(json.load(f))
+
+    board = sim.install()
+    chdir(ROOT)  # fonts and images are loaded relative to the project
+    from include.solar_display import SolarDisplay  # noqa: E402
+
+    display = SolarDisplay()
+    draw_frames(display, frames or [SAMPLE])
+    board.panel.png(out_path)
+    print("Saved: " + out_path)
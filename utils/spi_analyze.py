@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Analyse the SPI stream of one display refresh for wasted writes.
+
+Runs a refresh in the host simulator with an extra panel model listening
+on the bus, which counts how often every pixel is written and how each
+window is set up.  It reports overdraw, writes that leave a pixel
+unchanged, redundant window setups and single pixel blocks, and saves an
+overdraw heatmap (black: untouched, blue: once, then green, yellow and
+red for four or more writes).
+Usage:
+    python utils/spi_analyze.py [first|next|presence] [-o heatmap.png]
+    first draws the first frame after a clear, next (the default) the
+    following poll, and presence a presence only update.
+"""
+
+from os import chdir, path
+import contextlib
+import io
+import sys
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+from sim.panel import CASET, PASET, RAMWR, Panel, write_png  # noqa: E402
+from bench_render import DAY, EVENING  # noqa: E402
+
+# Command bytes to set a window: CASET and PASET with 4 bytes each, RAMWR
+WINDOW_BYTES = 11
+# Writes per pixel to heatmap colour
+HEAT = (
+    b"\x00\x00\x00",
+    b"\x00\x30\xc0",
+    b"\x00\xc0\x30",
+    b"\xe0\xe0\x00",
+    b"\xff\x20\x20",
+)
+TILE = 16
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+class Analyser(Panel):
+    """Panel model that records overdraw and window setup statistics."""
+
+    def __init__(self, levels, dc, screen, width=240, height=320):
+        """Constructor for analyser.
+
+        Args:
+            levels (dict): Pin id to logic level of the board.
+            dc (int): Data/command pin id.
+            screen (bytearray): What the panel shows before the refresh.
+        """
+        Panel.__init__(self, levels, dc, width, height)
+        self.fb[:] = screen
+        self.counts = bytearray(width * height)
+        self.unchanged = 0
+        self.setups = 0
+        self.redundant = 0
+        self.unused = 0
+        self.single = 0
+        self.pending = set()
+
+    def parameters(self):
+        previous = self.window
+        Panel.parameters(self)
+        if self.command in (CASET, PASET) and len(self.params) == 4:
+            self.setups += 1
+            if self.window == previous:
+                self.redundant += 1  # sets what is already set
+            elif self.command in self.pending:
+                self.unused += 1  # replaced before anything was written
+            self.pending.add(self.command)
+
+    def start(self, command):
+        Panel.start(self, command)
+        if command == RAMWR:
+            self.pending = set()
+            x0, y0, x1, y1 = self.window
+            if x0 == x1 and y0 == y1:
+                self.single += 1
+
+    def store(self, x, y, data):
+        base = y * self.width + x
+        counts = self.counts
+        for i in range(len(data) >> 1):
+            if counts[base + i] < 255:
+                counts[base + i] += 1
+        offset = base * 2
+        old = self.fb[offset : offset + len(data)]
+        if old == data:
+            self.unchanged += len(data)
+        else:
+            for i in range(0, len(data), 2):
+                if old[i : i + 2] == data[i : i + 2]:
+                    self.unchanged += 2
+        Panel.store(self, x, y, data)
+
+    def heatmap(self, path, rotate=90):
+        """Save the writes per pixel as an image."""
+        counts, width = self.counts, self.width
+
+        def colour(x, y):
+            return HEAT[min(counts[y * width + x], len(HEAT) - 1)]
+
+        write_png(path, self.width, self.height, colour, rotate)
+
+    def hottest(self, n=5):
+        """Return the n tiles with most repeated writes.
+
+        Returns:
+            list: (repeated writes, x, y) of TILE x TILE tiles.
+        """
+        tiles = []
+        for ty in range(0, self.height, TILE):
+            for tx in range(0, self.width, TILE):
+                repeats = 0
+                for y in range(ty, min(ty + TILE, self.height)):
+                    row = self.counts[y * self.width + tx : y * self.width + tx + TILE]
+                    repeats += sum(c - 1 for c in row if c > 1)
+                if repeats:
+                    tiles.append((repeats, tx, ty))
+        return sorted(tiles, reverse=True)[:n]
+
+    def report(self):
+        """Print the analysis."""
+        counts = self.counts
+        touched = sum(1 for c in counts if c)
+        writes = sum(counts)
+        histogram = [0] * 4
+        for c in counts:
+            if c:
+                histogram[min(c, 4) - 1] += 1
+        print(
+            "SPI: {} transactions, {} bytes ({} command, {} pixel), "
+            "{} windows".format(
+                self.transactions,
+                self.bytes,
+                self.command_bytes,
+                self.pixel_bytes,
+                self.windows,
+            )
+        )
+        print(
+            "Pixels: {} written {} times ({:.2f} writes each)".format(
+                touched, writes, writes / touched if touched else 0
+            )
+        )
+        print("  written once {}, twice {}, 3 times {}, 4+ times {}".format(*histogram))
+        print(
+            "Wasted: {} bytes rewriting pixels, {} bytes writing a pixel's "
+            "current colour".format((writes - touched) * 2, self.unchanged)
+        )
+        print(
+            "Window setups: {} ({} redundant, {} never written)".format(
+                self.setups, self.redundant, self.unused
+            )
+        )
+        print(
+            "Single pixel blocks: {} ({} command bytes for {} pixel "
+            "bytes)".format(self.single, self.single * WINDOW_BYTES, self.single * 2)
+        )
+        print("Most overdrawn {0}x{0} tiles (address x, y):".format(TILE))
+        for repeats, x, y in self.hottest():
+            print("  {:>3}, {:>3}: {} repeated writes".format(x, y, repeats))
+
+
+# Name: set up (not analysed), refresh
+SCENARIOS = {
+    "first": (lambda sd: sd.clear(), lambda sd: sd.solar_data(DAY)),
+    "next": (lambda sd: sd.solar_data(DAY), lambda sd: sd.solar_data(EVENING)),
+    "presence": (
+        lambda sd: sd.solar_data(DAY),
+        lambda sd: sd.solar_data(EVENING, sections=("presence",)),
+    ),
+}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    out_path = path.abspath("heatmap.png")
+    if "-o" in args:
+        i = args.index("-o")
+        if i + 1 >= len(args):
+            error("Please specify output file: -o heatmap.png")
+        out_path = path.abspath(args[i + 1])
+        del args[i : i + 2]
+    scenario = args[0] if args else "next"
+    if scenario not in SCENARIOS:
+        error("Unknown refresh: " + scenario + " (first, next or presence)")
+    setup, refresh = SCENARIOS[scenario]
+
+    board = sim.install()
+    chdir(ROOT)  # fonts and images are loaded relative to the project
+    from include.solar_display import SolarDisplay  # noqa: E402
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sd = SolarDisplay()
+        setup(sd)
+    analyser = Analyser(board.levels, board.panel.dc, board.panel.fb)
+    board.attach(1, 15, analyser)
+    with contextlib.redirect_stdout(io.StringIO()):
+        refresh(sd)
+    board.detach(1, analyser)
+    analyser.report()
+    analyser.heatmap(out_path)
+    print("Saved: " + out_path)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Utility to convert X-GLCD 'C' font files to the compact binary format.
+
+The binary format is read by include.xglcd_font.BinFont, which loads
+letters from flash as they are needed instead of parsing the whole file.
+Usage:
+    python xglcd2bin.py <font.c> <width> <height> <start_letter>
+    <font.c> is the X-GLCD font file, and width, height and start_letter
+    are the same values XglcdFont is given.  The output is <font>.bin.
+"""
+
+from os import path
+from struct import pack
+import sys
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from include.xglcd_font import BinFont, XglcdFont  # noqa: E402
+
+
+def error(msg):
+    """Display error and exit."""
+    print(msg)
+    sys.exit(-1)
+
+
+def count_letters(in_path):
+    """Count letter lines (those starting with hex values) in a font file."""
+    with open(in_path, "r") as f:
+        return sum(1 for line in f if line.strip().startswith("0x"))
+
+
+def write_font(f, font, letters=None):
+    """Save letters of a loaded font in binary format.
+
+    Args:
+        f (file): Binary file to write.
+        font (XglcdFont): Loaded font.
+        letters (list): (character code, letter index) pairs to save, which
+            are stored with a character map (default: all letters in order).
+    """
+    if letters is None:
+        start_letter, flags = font.start_letter, 0
+        glyphs = [font.glyph(i) for i in range(font.letter_count)]
+    else:
+        letters = sorted(letters)
+        start_letter, flags = letters[0][0], BinFont.FLAG_CHARMAP
+        glyphs = [font.glyph(i) for code, i in letters]
+    f.write(
+        pack(
+            BinFont.HEADER,
+            BinFont.MAGIC,
+            font.width,
+            font.height,
+            start_letter,
+            flags,
+            len(glyphs),
+            0,
+        )
+    )
+    f.write(bytes(width for width, data in glyphs))
+    if letters is not None:
+        f.write(bytes(code for code, i in letters))
+    for width, data in glyphs:
+        f.write(data)
+
+
+if __name__ == "__main__":
+    args = sys.argv
+    if len(args) != 5:
+        error(
+            "Please specify font file and size: "
+            "./xglcd2bin.py FuturaNum21x39.c 21 39 46"
+        )
+    in_path = args[1]
+    if not path.exists(in_path):
+        error("File Not Found: " + in_path)
+    width, height, start_letter = (int(a) for a in args[2:5])
+
+    font = XglcdFont(
+        in_path, width, height, start_letter, count_letters(in_path), cache_bytes=0
+    )
+    filename, ext = path.splitext(in_path)
+    out_path = filename + ".bin"
+    with open(out_path, "wb") as f:
+        write_font(f, font)
+    print("Saved: " + out_path)